@@ -1,25 +1,48 @@
 from dagster import Definitions
 
+from .assets.ytdl import yt_channel_videos
 from .jobs import ytdl as ytdl_jobs
+from .resources.downloads import DownloadSchedulerResource
+from .resources.history import HistoryStoreResource
 from .schedules import ytdl as ytdl_schedules
+from .sensors.ytdl import refresh_yt_channels_sensor, yt_channel_partitions_sensor
 from .utils.logging import setup_logging
-from .youtube.ytdl import YT_Channel
 
 setup_logging()
 
 __all__ = ["YT_Channel"]
 
 
+def __getattr__(name: str):
+    """Import YT_Channel, and with it yt_dlp, on first access rather than with the definitions."""
+    if name == "YT_Channel":
+        from .youtube.ytdl import YT_Channel
+
+        return YT_Channel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 jobs = [
+    ytdl_jobs.refresh_yt_channels,
     ytdl_jobs.refresh_yt_subscriptions,
+    ytdl_jobs.resume_yt_downloads,
     ytdl_jobs.download_from_url,
     ytdl_jobs.backfill_yt_channel,
     ytdl_jobs.delete_ephemeral_yt_videos_job,
+    ytdl_jobs.sync_yt_downloads_to_nas,
+    ytdl_jobs.index_yt_video_metadata,
 ]
 
-schedules = [ytdl_schedules.refresh_yt_subscriptions_schedule, ytdl_schedules.delete_ephemeral_yt_videos_schedule]
+schedules = [
+    ytdl_schedules.delete_ephemeral_yt_videos_schedule,
+    ytdl_schedules.sync_yt_downloads_to_nas_schedule,
+    ytdl_schedules.index_yt_video_metadata_schedule,
+]
 
 defs = Definitions(
+    assets=[yt_channel_videos],
     jobs=jobs,
     schedules=schedules,
+    sensors=[yt_channel_partitions_sensor, refresh_yt_channels_sensor],
+    resources={"history": HistoryStoreResource(), "downloads": DownloadSchedulerResource()},
 )
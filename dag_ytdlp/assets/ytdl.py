@@ -0,0 +1,38 @@
+from dagster import DynamicPartitionsDefinition, Failure, MaterializeResult, asset
+
+from ..config.ytdl import load_yt_subs_config
+from ..ops.ytdl import yt_channel_from_config
+from ..resources.downloads import DownloadSchedulerResource
+from ..resources.history import HistoryStoreResource
+from ..youtube.metrics import start_metrics_server
+
+# One partition per channel name of the subscriptions YAML, kept in sync by yt_channel_partitions_sensor
+yt_channel_partitions = DynamicPartitionsDefinition(name="yt_channels")
+
+
+@asset(
+    partitions_def=yt_channel_partitions,
+    group_name="youtube",
+    op_tags={"dagster/concurrency_key": "ytdl_channel"},
+)
+def yt_channel_videos(
+    context, history: HistoryStoreResource, downloads: DownloadSchedulerResource
+) -> MaterializeResult:
+    """Download the videos of a subscribed channel, one partition per channel.
+
+    Materializing a partition lists the channel, from its cached listing while still fresh, and downloads every new
+    or queued video. Phase timings and the time the channel is next due for listing are recorded as metadata.
+    """
+    start_metrics_server()
+    sub = load_yt_subs_config().get(context.partition_key)
+    if sub is None:
+        raise Failure(f"{context.partition_key} is not in the subscriptions config")
+    # no run_id: a single channel is cheaper to check against history with IN queries than a full snapshot
+    ytdl = yt_channel_from_config(sub, history.get_store(), scheduler=downloads.get_scheduler())
+    ytdl.fetch_entries()
+    ytdl.download_new_videos()
+    metadata = {**ytdl.metrics.as_metadata(), "cached": ytdl.listing_cached, "listed_videos": len(ytdl.video_urls)}
+    state = ytdl.history.get_channel_state(ytdl.url) or {}
+    if state.get("next_listing_at") is not None:
+        metadata["next_listing_at"] = state["next_listing_at"].isoformat()
+    return MaterializeResult(metadata=metadata)
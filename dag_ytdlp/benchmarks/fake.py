@@ -0,0 +1,92 @@
+"""Local stand-in for YoutubeDL serving synthetic channels, used by the benchmarks."""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Iterator
+
+PAGE_SIZE = 30
+
+# Size reported for every simulated download
+VIDEO_BYTES = 50 * 10**6
+
+CHANNEL_PATTERN = re.compile(r"@bench(\d+)")
+
+
+def bench_channel_url(channel_idx: int) -> str:
+    """Return the URL of a synthetic channel."""
+    return f"https://www.youtube.com/@bench{channel_idx}/videos"
+
+
+def bench_video_url(channel_idx: int, video_idx: int) -> str:
+    """Return the URL of a synthetic video, video_idx 0 being the newest."""
+    return f"https://www.youtube.com/watch?v={channel_idx:05d}{video_idx:06d}"
+
+
+class FakeYoutubeDL:
+    """YoutubeDL compatible class listing synthetic channels and simulating downloads.
+
+    Every synthetic channel has `videos` entries, newest first, served lazily one page at a time. Each extraction,
+    page and download waits for its configured latency and is counted in `requests`.
+    """
+
+    videos = 100
+    latency = 0.0
+    download_latency = 0.0
+    requests = 0
+    _lock = threading.Lock()
+
+    def __init__(self, params: dict = None):
+        """Initialize a new instance with yt-dlp options, as YoutubeDL does."""
+        self.params = params or {}
+
+    def __enter__(self):
+        """Return the instance, as YoutubeDL does."""
+        return self
+
+    def __exit__(self, *args):
+        """Do nothing, there is nothing to close."""
+        return None
+
+    @classmethod
+    def reset(cls, videos: int = 100, latency: float = 0.0, download_latency: float = 0.0):
+        """Set the synthetic channel size and latencies, and zero the request count."""
+        cls.videos = videos
+        cls.latency = latency
+        cls.download_latency = download_latency
+        cls.requests = 0
+
+    @classmethod
+    def _request(cls, latency: float):
+        """Count and wait for a simulated network request."""
+        with cls._lock:
+            cls.requests += 1
+        if latency > 0:
+            time.sleep(latency)
+
+    def extract_info(self, url: str, download: bool = False, process: bool = False) -> dict:
+        """Return the flat listing of a synthetic channel, or the metadata of a synthetic video."""
+        self._request(self.latency)
+        match = CHANNEL_PATTERN.search(url)
+        if match is None:
+            return {"url": url, "upload_date": "20240101"}
+        return {"entries": self._entries(int(match.group(1))), "playlist_count": self.videos}
+
+    def _entries(self, channel_idx: int) -> Iterator[dict]:
+        """Yield the entries of a channel, requesting a new page every PAGE_SIZE entries."""
+        for video_idx in range(self.videos):
+            if video_idx > 0 and video_idx % PAGE_SIZE == 0:
+                self._request(self.latency)
+            yield {"url": bench_video_url(channel_idx, video_idx), "title": f"Video {video_idx}", "duration": 600}
+
+    def download(self, urls: list[str]) -> int:
+        """Simulate downloading urls, calling progress and post hooks as YoutubeDL does. Returns 0 (success)."""
+        for url in urls:
+            self._request(self.download_latency)
+            for hook in self.params.get("progress_hooks", []):
+                hook({"status": "finished", "downloaded_bytes": VIDEO_BYTES})
+            for hook in self.params.get("post_hooks", []):
+                hook(f"/nonexistent/{url[-11:]}.mp4")
+        return 0
@@ -0,0 +1,73 @@
+"""Benchmark the import time of the Dagster definitions, as paid by each code server reload and run worker launch.
+
+Each target is imported in a fresh interpreter, repeat times, and the median wall time is reported along with the
+heavy dependencies it loaded. dagster alone is the floor; dag_ytdlp is what a code server or run worker loads before
+the first op runs; the youtube modules are what an op downloading videos loads on top of it.
+
+Required environment variables (PGSQL_*, YT_DOWNLOADS_PATH, LOG_HOME, TZ) are not needed to load the definitions,
+use --bare-env to check it:
+
+    python -m dag_ytdlp.benchmarks.imports --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    "dagster": "import dagster",
+    "dag_ytdlp": "import dag_ytdlp; dag_ytdlp.defs.get_repository_def()",
+    "dag_ytdlp + youtube": "import dag_ytdlp; import dag_ytdlp.youtube.ytdl, dag_ytdlp.youtube.history",
+}
+HEAVY_MODULES = ("yt_dlp", "sqlalchemy", "psycopg2")
+# Environment variables read on first use, removed by --bare-env
+REQUIRED_ENV = ("PGSQL_HOST", "PGSQL_DB", "PGSQL_PORT", "PGSQL_USER", "PGSQL_PASSWORD", "YT_DOWNLOADS_PATH", "LOG_HOME")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def time_import(statement: str, env: dict) -> dict:
+    """Run statement in a new interpreter, returning the seconds it took and the heavy modules it loaded."""
+    code = CHILD.format(statement=statement, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Time each target in fresh interpreters, printing the median and minimum import time and the modules loaded."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument("--bare-env", action="store_true", help="unset the required environment variables and TZ")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.bare_env:
+        for name in (*REQUIRED_ENV, "TZ"):
+            env.pop(name, None)
+    # warm up the file system cache and bytecode
+    for statement in TARGETS.values():
+        time_import(statement, env)
+
+    print(f"{'target':>20} {'median ms':>10} {'min ms':>8}  heavy modules loaded")
+    for name, statement in TARGETS.items():
+        runs = [time_import(statement, env) for _ in range(args.repeat)]
+        seconds = [run["seconds"] for run in runs]
+        loaded = ", ".join(runs[0]["loaded"]) or "-"
+        print(
+            f"{name:>20} {statistics.median(seconds) * 1000:>10.0f} {min(seconds) * 1000:>8.0f}  {loaded}", flush=True
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark a subscription refresh against synthetic channels and a local SQLite history.
+
+Mirrors refresh_yt_subscriptions without Dagster: listing (fetch_entries), history dedup (enqueue_new_videos),
+download planning and fan-out (queue.ready + plan_downloads), then one download per planned video. Each refresh is
+run twice: the first finds new_per_channel new videos per channel, the second is the steady state with none.
+
+Run with the environment of the code server, the configured database is not used:
+
+    python -m dag_ytdlp.benchmarks.refresh --subscriptions 10 100 1000 --history 10000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import sqlalchemy as db
+
+from ..youtube.history import HistoryStore, get_video_id
+from ..youtube.planning import plan_downloads
+from ..youtube.queue import DownloadQueue
+from ..youtube.scheduler import DownloadScheduler
+from ..youtube.tables import METADATA, downloads
+from ..youtube.ytdl import YT_Channel
+from .fake import FakeYoutubeDL, bench_channel_url, bench_video_url
+
+PHASES = ("listing", "dedup", "planning", "download")
+
+
+class BenchChannel(YT_Channel):
+    """YT_Channel listing and downloading from FakeYoutubeDL."""
+
+    ydl_class = FakeYoutubeDL
+
+
+def create_store(path: str) -> HistoryStore:
+    """Create a SQLite backed history store with all tables, ignoring the ytdl schema."""
+    store = HistoryStore(f"sqlite:///{path}", execution_options={"schema_translate_map": {"ytdl": None}})
+    METADATA.create_all(store.engine)
+    return store
+
+
+def seed_history(store: HistoryStore, subscriptions: int, history: int, videos: int, new_per_channel: int):
+    """Fill history with history rows: every video of each channel but the newest new_per_channel, then filler."""
+    now = dt.datetime.now()
+    rows = []
+    for channel_idx in range(subscriptions):
+        for video_idx in range(new_per_channel, videos):
+            rows.append({"url": bench_video_url(channel_idx, video_idx), "channel": f"bench{channel_idx}"})
+    filler = max(history - len(rows), 0)
+    rows.extend({"url": bench_video_url(99999, i), "channel": "filler"} for i in range(filler))
+    rows = [{**row, "video_id": get_video_id(row["url"]), "download_date": now} for row in rows]
+    with store.engine.begin() as conn:
+        for i in range(0, len(rows), 50000):
+            conn.execute(db.insert(downloads), rows[i : i + 50000])
+
+
+def run_refresh(store: HistoryStore, subscriptions: int, run_id: str, workers: int) -> dict:
+    """Run one refresh of all subscriptions, returning timings, request and DB round trip counts."""
+    counts = defaultdict(int)
+    timings = defaultdict(float)
+
+    def count_round_trip(*args):
+        counts["db"] += 1
+
+    db.event.listen(store.engine, "before_cursor_execute", count_round_trip)
+    FakeYoutubeDL.requests = 0
+    scheduler = DownloadScheduler(workers, workers, workers, None)
+    start = time.perf_counter()
+    channels = {}
+    for channel_idx in range(subscriptions):
+        url = bench_channel_url(channel_idx)
+        channels[url] = BenchChannel(
+            url, f"bench{channel_idx}", "bench", history=store, run_id=run_id, incremental=True, scheduler=scheduler
+        )
+        t = time.perf_counter()
+        channels[url].fetch_entries()
+        timings["listing"] += time.perf_counter() - t
+        t = time.perf_counter()
+        handled_urls = channels[url].enqueue_new_videos()
+        channels[url].update_high_water_mark(handled_urls)
+        timings["dedup"] += time.perf_counter() - t
+    t = time.perf_counter()
+    selected, _ = plan_downloads(DownloadQueue(store).ready(list(channels)), budget=10**15)
+    timings["planning"] += time.perf_counter() - t
+    t = time.perf_counter()
+    for item in selected:
+        channels[item["subscription_url"]].download_queued([item["url"]])
+    timings["download"] += time.perf_counter() - t
+    wall = time.perf_counter() - start
+    db.event.remove(store.engine, "before_cursor_execute", count_round_trip)
+    return {"wall": wall, "requests": FakeYoutubeDL.requests, "db": counts["db"], "downloads": len(selected), **timings}
+
+
+def main():
+    """Refresh each combination of subscriptions and history size twice, printing one line per refresh."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscriptions", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--history", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--videos", type=int, default=100, help="entries per synthetic channel")
+    parser.add_argument("--new-per-channel", type=int, default=2, help="new videos per channel on the first refresh")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per listing request or page")
+    parser.add_argument("--download-latency", type=float, default=0.0, help="seconds per download")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent downloads")
+    args = parser.parse_args()
+    logging.getLogger("ytdl_logger").setLevel(logging.ERROR)
+
+    header = f"{'subs':>6} {'history':>9} {'refresh':>8} {'wall s':>8} {'requests':>9} {'db trips':>9} {'dl':>6}"
+    print(header + "".join(f" {phase + ' s':>11}" for phase in PHASES))
+    for subscriptions in args.subscriptions:
+        for history in args.history:
+            FakeYoutubeDL.reset(args.videos, args.latency, args.download_latency)
+            with tempfile.TemporaryDirectory() as tmp:
+                store = create_store(os.path.join(tmp, "history.db"))
+                seed_history(store, subscriptions, history, args.videos, args.new_per_channel)
+                for refresh in ("new", "steady"):
+                    rslt = run_refresh(store, subscriptions, f"bench-{refresh}", args.workers)
+                    line = f"{subscriptions:>6} {history:>9} {refresh:>8} {rslt['wall']:>8.2f} {rslt['requests']:>9}"
+                    line += f" {rslt['db']:>9} {rslt['downloads']:>6}"
+                    print(line + "".join(f" {rslt[phase]:>11.3f}" for phase in PHASES), flush=True)
+                store.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
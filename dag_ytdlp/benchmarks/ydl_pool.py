@@ -0,0 +1,77 @@
+"""Benchmark the per-video overhead of building a YoutubeDL against borrowing one from YdlPool.
+
+Each simulated video gets its own options (output template, logger and hooks, as in YT_Channel.download_video),
+looks up the YouTube extractor and renders its file name, without any network request. Both default and best format
+options are measured, the latter setting up an FFmpeg postprocessor.
+
+Run with the environment of the code server:
+
+    python -m dag_ytdlp.benchmarks.ydl_pool --videos 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from yt_dlp import YoutubeDL
+
+from ..youtube.options import ChannelOptions
+from ..youtube.ydl_pool import YdlPool
+from ..youtube.ytdl import YdlLogger
+
+INFO = {"id": "dQw4w9WgXcQ", "title": "Video", "ext": "mp4", "channel": "bench", "upload_date": "20240101"}
+
+
+def video_opts(options: ChannelOptions, idx: int, file_paths: list) -> dict:
+    """Return the options of a single video download, with an episode numbered output template."""
+    return options.for_video(idx, logger=YdlLogger(), post_hooks=[file_paths.append], quiet=True)
+
+
+def simulate_video(ydl, idx: int) -> str:
+    """Do the per-video setup work of a download, returning the rendered file name."""
+    ydl.get_info_extractor("Youtube")
+    filename = ydl.prepare_filename(INFO)
+    assert f"E{idx})" in filename, filename
+    return filename
+
+
+def run_unpooled(options: ChannelOptions, videos: int) -> float:
+    """Return seconds per video when building a new YoutubeDL for each video."""
+    start = time.perf_counter()
+    for idx in range(videos):
+        with YoutubeDL(video_opts(options, idx, [])) as ydl:
+            simulate_video(ydl, idx)
+    return (time.perf_counter() - start) / videos
+
+
+def run_pooled(options: ChannelOptions, videos: int) -> float:
+    """Return seconds per video when borrowing from a pool, including building its first instance."""
+    pool = YdlPool(YoutubeDL)
+    start = time.perf_counter()
+    for idx in range(videos):
+        with pool.borrow(video_opts(options, idx, [])) as ydl:
+            simulate_video(ydl, idx)
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return elapsed / videos
+
+
+def main():
+    """Measure default and best format options, printing the per-video overhead with and without the pool."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=200, help="simulated videos per measurement")
+    args = parser.parse_args()
+
+    print(f"{'options':>8} {'new ms/video':>13} {'pooled ms/video':>16} {'speedup':>8}")
+    for name, best_format in (("default", False), ("best", True)):
+        options = ChannelOptions.build("bench", None, True, best_format)
+        # warm up imports and lazy extractor loading shared by both
+        run_unpooled(options, 2)
+        unpooled = run_unpooled(options, args.videos)
+        pooled = run_pooled(options, args.videos)
+        print(f"{name:>8} {unpooled * 1000:>13.2f} {pooled * 1000:>16.2f} {unpooled / pooled:>7.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,29 @@
 from os import environ
 
+from ..utils.config import get_env_var
 from ..utils.database import get_database_url
 
 DIALECT = "postgresql"
 DRIVER = "psycopg2"
-HOST = environ["PGSQL_HOST"]
-DATABASE = environ["PGSQL_DB"]
-PORT = environ["PGSQL_PORT"]
-USERNAME = environ["PGSQL_USER"]
-PASSWD = environ["PGSQL_PASSWORD"]
 
+# Connection pool shared by all history queries within a process
+POOL_SIZE = int(environ.get("PGSQL_POOL_SIZE", 5))
+MAX_OVERFLOW = int(environ.get("PGSQL_MAX_OVERFLOW", 5))
+POOL_RECYCLE = int(environ.get("PGSQL_POOL_RECYCLE", 1800))
 
-DATABASE_URL = get_database_url(DIALECT, DRIVER, USERNAME, PASSWD, HOST, PORT, DATABASE)
+
+def load_database_url() -> str:
+    """Return the SQLAlchemy URL of the history database, from the PGSQL_* environment variables.
+
+    Read when the history store is first created rather than on import, so the Dagster definitions load without
+    database credentials. Raises EnvVarMissingError if one is missing.
+    """
+    return get_database_url(
+        DIALECT,
+        DRIVER,
+        get_env_var("PGSQL_USER", "username"),
+        get_env_var("PGSQL_PASSWORD", "passwd"),
+        get_env_var("PGSQL_HOST", "host"),
+        get_env_var("PGSQL_PORT", "port"),
+        get_env_var("PGSQL_DB", "database"),
+    )
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import logging
+import os
+import threading
+from typing import Iterator, NamedTuple, Optional
+
+import yaml
+
+from ..utils.config import get_env_var
+from ..utils.exceptions import SubscriptionConfigError
+
+# libyaml's loader is several times faster, fall back to the pure Python one when PyYAML was built without it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Keys of the subscriptions YAML still accepted under their former name
+RENAMED_KEYS = {"use_playlist_index": "order_seq"}
+BOOL_OPTIONS = ("ephemeral", "best_format", "order_seq", "incremental", "cache_listing")
+INT_OPTIONS = ("priority", "max_bytes")
+# Ways of adding a video already downloaded by another channel, instead of skipping it
+LINK_MODES = ("hardlink", "symlink")
+
+logger = logging.getLogger("ytdl_logger")
+
+# Process-wide registries, keyed by path
+_REGISTRIES: dict[str, SubscriptionRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Subscription:
+    """A channel or playlist of the subscriptions YAML, see README for the options."""
+
+    channel: str
+    parent: str
+    url: str
+    ephemeral: bool = False
+    best_format: bool = False
+    order_seq: bool = False
+    incremental: bool = True
+    cache_listing: bool = True
+    priority: int = 0
+    max_bytes: Optional[int] = None
+    link_existing: Optional[str] = None
+
+    @property
+    def digest(self) -> str:
+        """Hash of every option, changing whenever the subscription is edited."""
+        return hashlib.sha1(repr(dataclasses.astuple(self)).encode()).hexdigest()
+
+    @classmethod
+    def from_yaml(cls, parent: str, channel: str, options: dict) -> Subscription:
+        """Validate the options of a channel in the subscriptions YAML, raising SubscriptionConfigError if invalid."""
+        if not isinstance(options, dict):
+            raise SubscriptionConfigError(f"{parent}/{channel}: expected a mapping of options, got {options!r}")
+        options = {RENAMED_KEYS.get(k, k): v for k, v in options.items()}
+        unknown = sorted(set(options) - {"url", "link_existing", *BOOL_OPTIONS, *INT_OPTIONS})
+        if len(unknown) > 0:
+            logger.warning(f"{parent}/{channel}: ignoring unknown option(s) {', '.join(unknown)}")
+        url = options.get("url")
+        if not isinstance(url, str) or url.strip() == "":
+            raise SubscriptionConfigError(f"{parent}/{channel}: url is required")
+        values = {"channel": str(channel), "parent": str(parent), "url": url.strip()}
+        for name in BOOL_OPTIONS:
+            if name in options:
+                if not isinstance(options[name], bool):
+                    raise SubscriptionConfigError(f"{parent}/{channel}: {name} must be true or false")
+                values[name] = options[name]
+        for name in INT_OPTIONS:
+            if options.get(name) is not None:
+                if isinstance(options[name], bool) or not isinstance(options[name], int):
+                    raise SubscriptionConfigError(f"{parent}/{channel}: {name} must be an integer")
+                values[name] = options[name]
+        if options.get("link_existing") is not None:
+            if options["link_existing"] not in LINK_MODES:
+                raise SubscriptionConfigError(
+                    f"{parent}/{channel}: link_existing must be one of {', '.join(LINK_MODES)}"
+                )
+            values["link_existing"] = options["link_existing"]
+        return cls(**values)
+
+
+class SubscriptionDiff(NamedTuple):
+    """Channels added, removed and changed between two versions of the subscriptions."""
+
+    added: list[str]
+    removed: list[str]
+    changed: list[str]
+
+    def __bool__(self) -> bool:
+        """Return True if any channel was added, removed or changed."""
+        return len(self.added) + len(self.removed) + len(self.changed) > 0
+
+
+class Subscriptions:
+    """Immutable set of subscriptions, in file order, with O(1) lookup by channel name."""
+
+    def __init__(self, subscriptions: tuple[Subscription, ...], digest: str):
+        """Initialize a set from validated subscriptions and the hash of the file they were read from."""
+        self.subscriptions = subscriptions
+        self.digest = digest
+        self.by_channel = {sub.channel: sub for sub in subscriptions}
+
+    def __iter__(self) -> Iterator[Subscription]:
+        """Iterate over the subscriptions in file order."""
+        return iter(self.subscriptions)
+
+    def __len__(self) -> int:
+        """Return the number of subscriptions."""
+        return len(self.subscriptions)
+
+    def __contains__(self, channel: str) -> bool:
+        """Return True if channel is subscribed."""
+        return channel in self.by_channel
+
+    def get(self, channel: str) -> Optional[Subscription]:
+        """Return the subscription of channel, or None if not subscribed."""
+        return self.by_channel.get(channel)
+
+    def digests(self) -> dict[str, str]:
+        """Return the digest of each subscription by channel, to diff against later versions."""
+        return {sub.channel: sub.digest for sub in self.subscriptions}
+
+    def diff(self, previous: dict[str, str]) -> SubscriptionDiff:
+        """Return the channels added, removed and changed since previous, as returned by digests."""
+        current = self.digests()
+        return SubscriptionDiff(
+            added=[channel for channel in current if channel not in previous],
+            removed=[channel for channel in previous if channel not in current],
+            changed=[channel for channel in current if channel in previous and previous[channel] != current[channel]],
+        )
+
+
+def parse_subscriptions(data: bytes) -> Subscriptions:
+    """Parse and validate the content of a subscriptions YAML, raising SubscriptionConfigError if invalid."""
+    try:
+        yt_subs = yaml.load(data, Loader=YamlLoader)
+    except yaml.YAMLError as e:
+        raise SubscriptionConfigError(f"Error parsing subscriptions YAML: {e}") from e
+    if yt_subs is None:
+        yt_subs = {}
+    if not isinstance(yt_subs, dict):
+        raise SubscriptionConfigError("Subscriptions YAML must map parent folders to channels")
+    subscriptions = []
+    seen = {}
+    for parent, entry in yt_subs.items():
+        if not isinstance(entry, dict):
+            raise SubscriptionConfigError(f"{parent}: expected a mapping of channels, got {entry!r}")
+        for channel, options in entry.items():
+            sub = Subscription.from_yaml(parent, channel, options)
+            if sub.channel in seen:
+                raise SubscriptionConfigError(
+                    f"{sub.channel} is subscribed under both {seen[sub.channel]} and {parent}"
+                )
+            seen[sub.channel] = parent
+            subscriptions.append(sub)
+    return Subscriptions(tuple(subscriptions), hashlib.sha256(data).hexdigest())
+
+
+class SubscriptionRegistry:
+    """Subscriptions YAML parsed once and reloaded only when the file changes.
+
+    The file is only stat'ed while its mtime and size are unchanged, and only parsed again when its content hash
+    changed, so a touched but identical file keeps the cached subscriptions.
+    """
+
+    def __init__(self, path: str):
+        """Initialize a registry for the subscriptions YAML at path."""
+        self.path = path
+        self._stat = None
+        self._subscriptions: Optional[Subscriptions] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Subscriptions:
+        """Return the current subscriptions, raising SubscriptionConfigError if the file is missing or invalid."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError as e:
+                raise SubscriptionConfigError(f"Subscriptions YAML {self.path} not found") from e
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            if self._subscriptions is not None and stat_key == self._stat:
+                return self._subscriptions
+            with open(self.path, "rb") as f:
+                data = f.read()
+            if self._subscriptions is None or hashlib.sha256(data).hexdigest() != self._subscriptions.digest:
+                self._subscriptions = parse_subscriptions(data)
+            self._stat = stat_key
+            return self._subscriptions
+
+
+def get_subscription_registry(path: Optional[str] = None) -> SubscriptionRegistry:
+    """Return the process-wide registry of the subscriptions YAML at path, YT_SUBS_PATH by default."""
+    if path is None:
+        path = get_env_var("YT_SUBS_PATH", "path")
+    with _REGISTRIES_LOCK:
+        if path not in _REGISTRIES:
+            _REGISTRIES[path] = SubscriptionRegistry(path)
+        return _REGISTRIES[path]
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import os
 from os import environ
 from typing import Optional
 
 from ..utils.config import get_env_var
-from ..utils.io import load_yaml
+from .subscriptions import Subscriptions, get_subscription_registry
 
-YT_DOWNLOADS_PATH = environ["YT_DOWNLOADS_PATH"]
+# Library downloads are synced to, optional unless syncing or linking synced videos
+YT_NAS_PATH = environ.get("YT_NAS_PATH")
 
 # Youtube DL opts
 # https://github.com/yt-dlp/yt-dlp/tree/master?tab=readme-ov-file#download-options
@@ -17,10 +19,10 @@ YDL_OPTS_ALL = {
     "writethumbnail": True,
     "writedescription": True,
     "writeinfojson": True,
-    "outtmpl": (
-        f"{YT_DOWNLOADS_PATH}/%(channel)s/Season %(upload_date>%y)s/%(title)s "
-        "(S%(upload_date>%y)sE%(upload_date>%m%d)s).%(ext)s"
-    ),
+    # resume partial .part files left by an interrupted run
+    "continuedl": True,
+    # relative to YT_DOWNLOADS_PATH, prepended when the options of a channel are built
+    "outtmpl": "%(channel)s/Season %(upload_date>%y)s/%(title)s (S%(upload_date>%y)sE%(upload_date>%m%d)s).%(ext)s",
 }
 
 YDL_OPTS_DEFAULT = YDL_OPTS_ALL.copy()
@@ -35,20 +37,88 @@ YDL_OPTS_BEST["postprocessors"] = [
     }
 ]
 
+# Incremental listing: entries are checked against history one page at a time, and paging stops after
+# INCREMENTAL_STOP_AFTER consecutive previously downloaded videos
+INCREMENTAL_PAGE_SIZE = 30
+INCREMENTAL_STOP_AFTER = 5
 
-def load_yt_subs_config(path: Optional[str] = None) -> list[dict]:
-    """Load the YT subs yaml as a list of dicts.
+# Concurrent downloads within a run worker. YT_MAX_BANDWIDTH (bytes/s) is split evenly between download slots.
+DOWNLOAD_WORKERS = int(environ.get("YT_DOWNLOAD_WORKERS", 4))
+DOWNLOAD_WORKERS_PER_CHANNEL = int(environ.get("YT_DOWNLOAD_WORKERS_PER_CHANNEL", 2))
+DOWNLOAD_WORKERS_PER_HOST = int(environ.get("YT_DOWNLOAD_WORKERS_PER_HOST", 4))
+MAX_BANDWIDTH = int(environ["YT_MAX_BANDWIDTH"]) if environ.get("YT_MAX_BANDWIDTH") else None
+
+# Listings are cached for a fraction of the channel's posting interval, between the two bounds (seconds)
+LISTING_TTL_FRACTION = 0.25
+LISTING_TTL_MIN = 0
+LISTING_TTL_MAX = int(environ.get("YT_LISTING_TTL_MAX", 2 * 24 * 3600))
+
+# Download planning: space kept free under YT_DOWNLOADS_PATH, optional byte budget per run, and the bitrates (bytes/s)
+# used to estimate a video's size from its duration when yt-dlp reports no filesize
+DISK_RESERVE_BYTES = int(environ.get("YT_DISK_RESERVE_BYTES", 10 * 10**9))
+RUN_BYTE_BUDGET = int(environ["YT_RUN_BYTE_BUDGET"]) if environ.get("YT_RUN_BYTE_BUDGET") else None
+BITRATE_DEFAULT = 5 * 10**6 // 8
+BITRATE_BEST = 15 * 10**6 // 8
+FALLBACK_VIDEO_BYTES = 500 * 10**6
+
+# Worker processes running postprocessors (e.g. the mkv conversion of best_format channels) while the next videos
+# download, and files waiting for a worker before downloads block. 0 runs postprocessors inline in yt-dlp.
+POSTPROCESS_WORKERS = int(environ.get("YT_POSTPROCESS_WORKERS", os.cpu_count() or 1))
+POSTPROCESS_QUEUE = int(environ.get("YT_POSTPROCESS_QUEUE", 2 * POSTPROCESS_WORKERS))
+
+# Idle YoutubeDL instances kept per set of options, reused across videos and channels of a run worker
+YDL_POOL_SIZE = int(environ.get("YT_YDL_POOL_SIZE", 8))
+
+# Channels listed at once by the discovery step of a refresh
+DISCOVERY_WORKERS = int(environ.get("YT_DISCOVERY_WORKERS", 8))
+
+# Channel feeds are polled every FEED_POLL_FRACTION of the channel's posting interval, between the two bounds
+# (seconds). At most FEED_POLL_BATCH due feeds are polled per sensor tick, FEED_WORKERS at a time.
+FEED_POLL_FRACTION = 0.1
+FEED_POLL_MIN = int(environ.get("YT_FEED_POLL_MIN", 15 * 60))
+FEED_POLL_MAX = int(environ.get("YT_FEED_POLL_MAX", 6 * 3600))
+FEED_POLL_BATCH = int(environ.get("YT_FEED_POLL_BATCH", 50))
+FEED_WORKERS = 8
+# Channels with download queue items ready (retries past their backoff, deferred videos) and left untouched for
+# QUEUE_RUN_INTERVAL seconds are refreshed by the feed sensor, at most once per interval
+QUEUE_RUN_INTERVAL = int(environ.get("YT_QUEUE_RUN_INTERVAL", 3600))
+FEED_TIMEOUT = 10
+
+# Downloads transferred to the NAS at once, and files synced per run of sync_yt_downloads_to_nas
+SYNC_WORKERS = int(environ.get("YT_SYNC_WORKERS", 4))
+SYNC_BATCH = int(environ.get("YT_SYNC_BATCH", 500))
+SYNC_CHUNK_SIZE = 1024 * 1024
+
+# Rows written at once when indexing .info.json sidecars
+INDEX_BATCH = 500
+
+# Port of the optional Prometheus text endpoint serving per-channel phase timings and bytes downloaded
+METRICS_PORT = int(environ["YT_METRICS_PORT"]) if environ.get("YT_METRICS_PORT") else None
+
+# Queue items leased for longer than this are assumed abandoned by a killed run
+DOWNLOAD_LEASE_SECONDS = int(environ.get("YT_DOWNLOAD_LEASE_SECONDS", 3 * 3600))
+
+# Failed downloads are retried after RETRY_BASE_SECONDS * 2 ** (attempts - 1), capped at RETRY_MAX_SECONDS, and
+# quarantined after MAX_ATTEMPTS or on the first permanent error
+RETRY_BASE_SECONDS = 3600
+RETRY_MAX_SECONDS = 7 * 24 * 3600
+MAX_ATTEMPTS = 8
+
+
+def get_downloads_path() -> str:
+    """Return YT_DOWNLOADS_PATH, the folder videos are downloaded to before being synced to the NAS.
+
+    Read on first use rather than on import, so the Dagster definitions load without it. Raises EnvVarMissingError
+    if missing.
+    """
+    return get_env_var("YT_DOWNLOADS_PATH", "path")
+
+
+def load_yt_subs_config(path: Optional[str] = None) -> Subscriptions:
+    """Load the YT subs yaml as validated subscriptions, cached until the file changes.
 
     If path is None (default), will use YT_SUBS_PATH from enironment.
+    Raises SubscriptionConfigError if the file is missing or invalid.
 
     """
-    if path is None:
-        path = get_env_var("YT_SUBS_PATH", "path")
-    subs = []
-    yt_subs = load_yaml(path)
-    for parent, entry in yt_subs.items():
-        for channel, options in entry.items():
-            options["parent"] = parent
-            options["channel"] = channel
-            subs.append(options)
-    return subs
+    return get_subscription_registry(path).load()
@@ -1,18 +1,38 @@
-from dagster import job
+from dagster import define_asset_job, job
 
+from ..assets.ytdl import yt_channel_partitions, yt_channel_videos
+from ..config.ytdl import DOWNLOAD_WORKERS
 from ..ops.ytdl import (
     backfill_yt_channel_if_valid,
     delete_ephemeral_yt_videos_op,
-    download_new_yt_episodes,
+    discover_new_yt_videos,
+    download_queued_yt_videos,
     download_yt_from_url,
-    get_yt_channels,
+    download_yt_video,
+    index_video_metadata_op,
+    sync_downloads_to_nas_op,
 )
 
+# Each video is downloaded by its own step, so the executor's limit is the number of concurrent downloads
+refresh_config = {"execution": {"config": {"multiprocess": {"max_concurrent": DOWNLOAD_WORKERS}}}}
 
-@job
+
+@job(config=refresh_config)
 def refresh_yt_subscriptions():
-    yt_channels = get_yt_channels()
-    yt_channels.map(download_new_yt_episodes).collect()
+    new_videos = discover_new_yt_videos()
+    new_videos.map(download_yt_video).collect()
+
+
+# One run per channel partition, launched for channels with new uploads by refresh_yt_channels_sensor or as a backfill
+refresh_yt_channels = define_asset_job(
+    "refresh_yt_channels", selection=[yt_channel_videos], partitions_def=yt_channel_partitions
+)
+
+
+@job
+def resume_yt_downloads():
+    """Download the videos left in the download queue, without listing channels."""
+    download_queued_yt_videos()
 
 
 INSTRUCTIONS = "1. Copy & Paste URL below."
@@ -47,7 +67,13 @@ def backfill_yt_channel():
     backfill_yt_channel_if_valid()
 
 
-delete_ephemeral_yt_videos_job_config = {"ops": {"delete_ephemeral_yt_videos_op": {"config": {"ephmeral_days": 60}}}}
+delete_ephemeral_yt_videos_job_config = {
+    "ops": {
+        "delete_ephemeral_yt_videos_op": {
+            "config": {"ephmeral_days": 60, "dry_run": False, "max_workers": 8, "scan_filesystem": False}
+        }
+    }
+}
 
 
 @job(config=delete_ephemeral_yt_videos_job_config)
@@ -55,5 +81,27 @@ def delete_ephemeral_yt_videos_job():
     delete_ephemeral_yt_videos_op()
 
 
+sync_yt_downloads_to_nas_config = {
+    "ops": {"sync_downloads_to_nas_op": {"config": {"max_workers": 4, "batch_size": 500, "delete_local": True}}}
+}
+
+
+@job(config=sync_yt_downloads_to_nas_config)
+def sync_yt_downloads_to_nas():
+    """Copy completed downloads to YT_NAS_PATH, verified by checksum."""
+    sync_downloads_to_nas_op()
+
+
+index_yt_video_metadata_config = {
+    "ops": {"index_video_metadata_op": {"config": {"root": "", "full": False, "batch_size": 500}}}
+}
+
+
+@job(config=index_yt_video_metadata_config)
+def index_yt_video_metadata():
+    """Index the .info.json sidecars of the library into the videos table."""
+    index_video_metadata_op()
+
+
 if __name__ == "__main__":
     refresh_yt_subscriptions.execute_in_process()
@@ -1,55 +1,143 @@
+import dataclasses
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from dagster import DynamicOut, DynamicOutput, op
+from dagster import AssetMaterialization, DynamicOut, DynamicOutput, op
 
-from ..config.ytdl import load_yt_subs_config
+from ..config.subscriptions import Subscription
+from ..config.ytdl import (
+    DISCOVERY_WORKERS,
+    INDEX_BATCH,
+    SYNC_BATCH,
+    SYNC_WORKERS,
+    get_downloads_path,
+    load_yt_subs_config,
+)
+from ..resources.downloads import DownloadSchedulerResource
+from ..resources.history import HistoryStoreResource
 from ..utils.config import get_env_var
-from ..utils.io import delete_legacy_files
-from ..youtube.ytdl import YT_Channel
+from ..utils.io import CLEANUP_WORKERS, delete_legacy_files_concurrently
+from ..youtube.metrics import start_metrics_server
+from ..youtube.planning import plan_downloads
+from ..youtube.scheduler import DownloadScheduler
+
+# Modules importing yt_dlp or SQLAlchemy are imported by the ops using them, so the code server and run workers
+# load the definitions without them
+if TYPE_CHECKING:
+    from ..youtube.history import HistoryStore
+    from ..youtube.ytdl import YT_Channel
 
 LOGGER = logging.getLogger("ytdl_logger")
 
 
-@op(out=DynamicOut())
-def get_yt_channels(path: Optional[str] = None) -> List[Dict]:
-    """Load YT subscription config as dict.
+def to_mapping_key(name: str) -> str:
+    """Convert a channel name or video ID to a valid Dagster mapping key."""
+    key = name.replace(" ", "_").replace("-", "_DASH_").replace(".", "_DOT_").replace("'", "")
+    return re.sub(r"[^A-Za-z0-9_]", "", key)
+
+
+def yt_channel_from_config(
+    sub: Subscription, store: "HistoryStore", run_id: Optional[str] = None, scheduler: DownloadScheduler = None
+) -> "YT_Channel":
+    """Create a YT_Channel for a subscription of the subscriptions YAML."""
+    from ..youtube.ytdl import YT_Channel
+
+    return YT_Channel(
+        sub.url,
+        sub.channel,
+        sub.parent,
+        sub.order_seq,
+        sub.best_format,
+        store,
+        run_id,
+        sub.incremental,
+        scheduler,
+        sub.cache_listing,
+        sub.priority,
+        sub.max_bytes,
+        sub.link_existing,
+    )
 
-    Args:
-    ----
-        path (str, optional): Path to config location for YT channels.
-        If None (default), will use YT_FULL_PATH from environment.
 
-    Returns dict of YT channel title and YT channel url with additional optional args.
+@op(out=DynamicOut())
+def discover_new_yt_videos(context, history: HistoryStoreResource) -> List[Dict]:
+    """List all subscribed channels and emit every video waiting to be downloaded.
 
+    New videos are added to the download queue. Videos ready in the queue for a subscribed channel, new or left
+    over by a previous run, are planned against the free disk space and channel byte budgets. Each video selected
+    is emitted as a dict with its URL, playlist index and channel options, the others stay queued for a later run.
+    The listing phases of each channel are logged as a materialization of its listing.
     """
-    yt_chan_list = load_yt_subs_config(path)
-    for yt_channel in yt_chan_list:
+    from ..youtube.history import get_video_id
+    from ..youtube.queue import QUEUE_ITEM_KEYS, DownloadQueue
+
+    start_metrics_server()
+    store = history.get_store()
+    yt_chan_list = load_yt_subs_config()
+
+    def discover(sub: Subscription) -> "YT_Channel":
+        ytdl = yt_channel_from_config(sub, store, context.run_id)
+        ytdl.fetch_entries()
+        handled_urls = ytdl.enqueue_new_videos()
+        if ytdl.incremental:
+            ytdl.update_high_water_mark(handled_urls)
+        return ytdl
+
+    with ThreadPoolExecutor(DISCOVERY_WORKERS, thread_name_prefix="ytdl-discovery") as executor:
+        futures = {executor.submit(discover, sub): sub.channel for sub in yt_chan_list}
+    for future, channel in futures.items():
+        if future.exception() is not None:
+            LOGGER.warning(f"Listing {channel} failed: {future.exception()}")
+        else:
+            ytdl = future.result()
+            yield AssetMaterialization(
+                asset_key=["ytdl_listing", to_mapping_key(channel)],
+                description=f"Listing of {channel}",
+                metadata={
+                    **ytdl.metrics.as_metadata(),
+                    "cached": ytdl.listing_cached,
+                    "listed_videos": len(ytdl.video_urls),
+                },
+            )
+
+    queue = DownloadQueue(store)
+    items = queue.ready([sub.url for sub in yt_chan_list])
+    selected, deferred = plan_downloads(items, {sub.url: sub.max_bytes for sub in yt_chan_list})
+    context.log.info(f"{len(selected)} video(s) to download, {len(deferred)} deferred")
+    for item in selected:
         yield DynamicOutput(
-            yt_channel,
-            mapping_key=f'{yt_channel["channel"]}'.replace(" ", "_")
-            .replace("-", "_DASH_")
-            .replace(".", "_DOT_")
-            .replace("'", ""),
+            {key: item[key] for key in QUEUE_ITEM_KEYS},
+            mapping_key=to_mapping_key(get_video_id(item["url"])),
         )
 
 
-@op
-def download_new_yt_episodes(yt_channel: dict):
-    """Download all new videos for a given channel config dict."""
-    url = yt_channel["url"]
-    channel = yt_channel["channel"]
-    parent = yt_channel["parent"]
-    order_seq = yt_channel.get("order_seq", False)
-    best_format = yt_channel.get("best_format", False)
-    ytdl = YT_Channel(url, channel, parent, order_seq, best_format)
-    ytdl.fetch_entries()
-    ytdl.download_new_videos()
+@op(tags={"dagster/concurrency_key": "ytdl_download"})
+def download_yt_video(context, item: dict, history: HistoryStoreResource, downloads: DownloadSchedulerResource):
+    """Download a single queued video emitted by discover_new_yt_videos, with its timings as output metadata."""
+    from ..youtube.ytdl import YT_Channel
+
+    start_metrics_server()
+    ytdl = YT_Channel(
+        item["subscription_url"],
+        item["channel"],
+        item["parent"],
+        bool(item["order_seq"]),
+        bool(item["best_format"]),
+        history.get_store(),
+        context.run_id,
+        scheduler=downloads.get_scheduler(),
+    )
+    ytdl.download_queued([item["url"]])
+    context.add_output_metadata({"channel": item["channel"], **ytdl.metrics.as_metadata()})
 
 
 @op(config_schema=dict)
-def download_yt_from_url(context):
+def download_yt_from_url(context, history: HistoryStoreResource, downloads: DownloadSchedulerResource):
+    from ..youtube.ytdl import YT_Channel
+
     url = context.op_config.get("url", "")
     channel = "MISC"
     if not context.op_config.get("use_MISC_channel", True):
@@ -57,41 +145,132 @@ def download_yt_from_url(context):
     if url == "":
         LOGGER.error("No url entered.")
     else:
-        ytdl = YT_Channel(url, channel)
+        ytdl = YT_Channel(url, channel, history=history.get_store(), scheduler=downloads.get_scheduler())
         ytdl.download_from_url()
 
 
 @op(config_schema=dict)
-def backfill_yt_channel_if_valid(context):
+def backfill_yt_channel_if_valid(context, history: HistoryStoreResource, downloads: DownloadSchedulerResource):
     channel = context.op_config.get("channel", "")
     max_videos = context.op_config.get("max_videos", 100)
-    yt_chan_list = load_yt_subs_config()
-    url = None
-    for yt_channel in yt_chan_list:
-        if channel == yt_channel["channel"]:
-            url = yt_channel["url"]
-            parent = yt_channel["parent"]
-            order_seq = yt_channel.get("order_seq", False)
-            best_format = yt_channel.get("best_format", False)
-    if url is None:
+    sub = load_yt_subs_config().get(channel)
+    if sub is None:
         LOGGER.error(f"Bad configuration for {channel}.")
     else:
-        ytdl = YT_Channel(url, channel, parent, order_seq, best_format)
+        sub = dataclasses.replace(sub, incremental=False, cache_listing=False)
+        ytdl = yt_channel_from_config(sub, history.get_store(), scheduler=downloads.get_scheduler())
         ytdl.set_max_videos(max_videos)
         ytdl.fetch_entries()
         ytdl.download_new_videos()
 
 
+@op
+def download_queued_yt_videos(context, history: HistoryStoreResource, downloads: DownloadSchedulerResource):
+    """Download every video left in the download queue, without listing channels.
+
+    The timings of each channel are added to the output metadata.
+    """
+    from ..youtube.queue import DownloadQueue
+
+    start_metrics_server()
+    store = history.get_store()
+    metadata = {}
+    for item in DownloadQueue(store).pending_subscriptions():
+        sub = Subscription(
+            item["channel"],
+            item["parent"],
+            item["subscription_url"],
+            best_format=bool(item["best_format"]),
+            order_seq=bool(item["order_seq"]),
+            incremental=False,
+            cache_listing=False,
+        )
+        ytdl = yt_channel_from_config(sub, store, context.run_id, downloads.get_scheduler())
+        ytdl.download_queued()
+        metadata[sub.channel] = ytdl.metrics.as_metadata()
+    context.add_output_metadata({"channels": metadata})
+
+
 @op(config_schema=dict)
-def delete_ephemeral_yt_videos_op(context):
+def delete_ephemeral_yt_videos_op(context, history: HistoryStoreResource):
+    """Delete old videos of ephemeral channels, or only report reclaimable bytes if dry_run is set.
+
+    Expired videos are found from the download dates in history. Set scan_filesystem to also scan channel folders
+    for files downloaded before history recorded file paths.
+    """
+    from ..youtube.retention import delete_expired_downloads_concurrently
+
     ephmeral_days = context.op_config.get("ephmeral_days", 365)
+    dry_run = context.op_config.get("dry_run", False)
+    max_workers = context.op_config.get("max_workers", CLEANUP_WORKERS)
+    scan_filesystem = context.op_config.get("scan_filesystem", False)
     yt_chan_list = load_yt_subs_config()
     YT_NAS_PATH = get_env_var("YT_NAS_PATH", "YT_NAS_PATH")
-    for yt_channel in yt_chan_list:
-        if yt_channel.get("ephemeral", False):
-            ch_path = Path(YT_NAS_PATH, yt_channel["parent"], yt_channel["channel"])
+    ephemeral_channels = [sub for sub in yt_chan_list if sub.ephemeral]
+    report = delete_expired_downloads_concurrently(
+        history.get_store(),
+        [sub.channel for sub in ephemeral_channels],
+        YT_NAS_PATH,
+        ephmeral_days,
+        dry_run,
+        max_workers,
+    )
+    if scan_filesystem:
+        ch_paths = []
+        for sub in ephemeral_channels:
+            ch_path = Path(YT_NAS_PATH, sub.parent, sub.channel)
             if ch_path.exists() and ch_path.is_dir():
-                delete_legacy_files(ch_path, ephmeral_days)
+                ch_paths.append(ch_path)
+        report.update(delete_legacy_files_concurrently(ch_paths, ephmeral_days, dry_run, max_workers))
+    verb = "reclaimable" if dry_run else "reclaimed"
+    for name, size in sorted(report.items(), key=lambda x: -x[1]):
+        context.log.info(f"{size / 1e9:.2f} GB {verb} from {name}")
+    context.add_output_metadata({"dry_run": dry_run, f"bytes_{verb}": sum(report.values()), "channels": report})
+    return report
+
+
+@op(config_schema=dict, tags={"dagster/concurrency_key": "ytdl_nas_sync"})
+def sync_downloads_to_nas_op(context, history: HistoryStoreResource):
+    """Transfer downloaded videos and their sidecar files to YT_NAS_PATH, oldest first.
+
+    Files are found from history, copied max_workers at a time and verified by checksum. Local copies are deleted
+    once verified, unless delete_local is false.
+    """
+    from ..youtube.sync import sync_downloads
+
+    max_workers = context.op_config.get("max_workers", SYNC_WORKERS)
+    batch_size = context.op_config.get("batch_size", SYNC_BATCH)
+    delete_local = context.op_config.get("delete_local", True)
+    YT_NAS_PATH = get_env_var("YT_NAS_PATH", "YT_NAS_PATH")
+    report = sync_downloads(
+        history.get_store(), get_downloads_path(), YT_NAS_PATH, delete_local, max_workers, batch_size
+    )
+    context.log.info(
+        f"Synced {report['downloads']} download(s), {report['bytes'] / 1e9:.2f} GB, {report['failed']} failed"
+    )
+    context.add_output_metadata({"delete_local": delete_local, **report})
+    return report
+
+
+@op(config_schema=dict)
+def index_video_metadata_op(context, history: HistoryStoreResource):
+    """Index the .info.json sidecars of the library into ytdl.videos, only parsing those new or modified.
+
+    The library under YT_NAS_PATH is indexed unless root is set. Set full to parse every sidecar again.
+    """
+    from ..youtube.library import VideoIndex
+
+    root = context.op_config.get("root") or get_env_var("YT_NAS_PATH", "YT_NAS_PATH")
+    full = context.op_config.get("full", False)
+    batch_size = context.op_config.get("batch_size", INDEX_BATCH)
+    index = VideoIndex(history.get_store())
+    report = index.refresh(root, full, batch_size)
+    context.log.info(
+        f"Indexed {report['indexed']} video(s), {report['unchanged']} unchanged, {report['removed']} removed"
+    )
+    usage = index.usage_by_channel()
+    context.add_output_metadata({"root": root, "full": full, **report, "channels": usage})
+    return report
 
 
 if __name__ == "__main__":
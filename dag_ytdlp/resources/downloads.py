@@ -0,0 +1,22 @@
+from typing import Optional
+
+from dagster import ConfigurableResource
+
+from ..config.ytdl import DOWNLOAD_WORKERS, DOWNLOAD_WORKERS_PER_CHANNEL, DOWNLOAD_WORKERS_PER_HOST, MAX_BANDWIDTH
+from ..youtube.scheduler import DownloadScheduler, get_download_scheduler
+
+
+class DownloadSchedulerResource(ConfigurableResource):
+    """Dagster resource handing out the process-wide download scheduler.
+
+    Limits apply to all channels downloading within one run worker.
+    """
+
+    max_workers: int = DOWNLOAD_WORKERS
+    per_channel: int = DOWNLOAD_WORKERS_PER_CHANNEL
+    per_host: int = DOWNLOAD_WORKERS_PER_HOST
+    max_bandwidth: Optional[int] = MAX_BANDWIDTH
+
+    def get_scheduler(self) -> DownloadScheduler:
+        """Return the shared scheduler for this resource's limits."""
+        return get_download_scheduler(self.max_workers, self.per_channel, self.per_host, self.max_bandwidth)
@@ -0,0 +1,26 @@
+from typing import TYPE_CHECKING
+
+from dagster import ConfigurableResource
+
+from ..config.database import MAX_OVERFLOW, POOL_SIZE
+
+if TYPE_CHECKING:
+    from ..youtube.history import HistoryStore
+
+
+class HistoryStoreResource(ConfigurableResource):
+    """Dagster resource handing out the process-wide download history store.
+
+    All ops in a process share one pooled engine; pool_size + max_overflow caps the connections a single run
+    worker opens against Postgres. SQLAlchemy and the database settings are only loaded when a store is first
+    requested, so loading the definitions stays cheap.
+    """
+
+    pool_size: int = POOL_SIZE
+    max_overflow: int = MAX_OVERFLOW
+
+    def get_store(self) -> "HistoryStore":
+        """Return the shared store for this resource's pool settings."""
+        from ..youtube.history import get_history_store
+
+        return get_history_store(pool_size=self.pool_size, max_overflow=self.max_overflow)
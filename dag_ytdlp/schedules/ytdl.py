@@ -2,18 +2,27 @@ from os import environ
 
 from dagster import schedule
 
-from ..jobs.ytdl import delete_ephemeral_yt_videos_job, refresh_yt_subscriptions
+from ..jobs.ytdl import delete_ephemeral_yt_videos_job, index_yt_video_metadata, sync_yt_downloads_to_nas
 
-TZ = environ["TZ"]
-
-
-# Daily @ 4:05am, 12:05pm, 6:05pm, 11:05pm
-@schedule(cron_schedule="5 4,12,18,23 * * *", job=refresh_yt_subscriptions, execution_timezone=TZ)
-def refresh_yt_subscriptions_schedule(_context):
-    return {}
+# Schedules run in UTC when TZ is not set
+TZ = environ.get("TZ", "UTC")
 
 
 # Daily @ 2AM
 @schedule(cron_schedule="10 2 * * *", job=delete_ephemeral_yt_videos_job, execution_timezone=TZ)
 def delete_ephemeral_yt_videos_schedule(_context):
     return {}
+
+
+# Every 15 minutes
+@schedule(cron_schedule="*/15 * * * *", job=sync_yt_downloads_to_nas, execution_timezone=TZ)
+def sync_yt_downloads_to_nas_schedule(_context):
+    """Sync completed downloads to the NAS every 15 minutes, with the default job config."""
+    return {}
+
+
+# Hourly, after the sync of the hour
+@schedule(cron_schedule="50 * * * *", job=index_yt_video_metadata, execution_timezone=TZ)
+def index_yt_video_metadata_schedule(_context):
+    """Index new sidecars hourly, after the sync of the hour, with the default job config."""
+    return {}
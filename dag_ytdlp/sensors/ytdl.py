@@ -0,0 +1,111 @@
+import datetime as dt
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from dagster import DefaultSensorStatus, RunRequest, SensorResult, SkipReason, sensor
+
+from ..assets.ytdl import yt_channel_partitions
+from ..config.subscriptions import Subscription
+from ..config.ytdl import FEED_POLL_BATCH, FEED_WORKERS, QUEUE_RUN_INTERVAL, load_yt_subs_config
+from ..jobs.ytdl import refresh_yt_channels
+from ..youtube.listing import listing_due, to_aware
+
+
+# Every 5 minutes, so channels added to the subscriptions YAML are picked up by the next refresh
+@sensor(job=refresh_yt_channels, minimum_interval_seconds=300, default_status=DefaultSensorStatus.RUNNING)
+def yt_channel_partitions_sensor(context):
+    """Add and remove yt_channels partitions to match the channels of the subscriptions YAML.
+
+    The digest of each subscription is kept in the cursor. Channels added or edited since the previous evaluation
+    get their incremental state and cached listing reset, and a refresh run, so new options apply to their whole
+    listing. The first evaluation only records the digests.
+    """
+    from ..youtube.history import get_history_store
+
+    subs = load_yt_subs_config()
+    existing = set(context.instance.get_dynamic_partitions(yt_channel_partitions.name))
+    added = [sub.channel for sub in subs if sub.channel not in existing]
+    removed = sorted(existing - set(subs.by_channel))
+    requests = []
+    if len(added) > 0:
+        requests.append(yt_channel_partitions.build_add_request(added))
+    if len(removed) > 0:
+        requests.append(yt_channel_partitions.build_delete_request(removed))
+    run_requests = []
+    if context.cursor is not None:
+        diff = subs.diff(json.loads(context.cursor))
+        if diff:
+            context.log.info(
+                f"Subscriptions changed: added {diff.added}, removed {diff.removed}, changed {diff.changed}"
+            )
+        store = get_history_store()
+        now = dt.datetime.now().astimezone()
+        for channel in diff.added + diff.changed:
+            sub = subs.get(channel)
+            store.set_channel_state(
+                sub.url, channel=channel, last_video_id=None, listing=None, listed_at=None, next_listing_at=now
+            )
+            run_requests.append(RunRequest(run_key=f"{channel}:{sub.digest}", partition_key=channel))
+    return SensorResult(
+        run_requests=run_requests, dynamic_partitions_requests=requests, cursor=json.dumps(subs.digests())
+    )
+
+
+@sensor(job=refresh_yt_channels, minimum_interval_seconds=60, default_status=DefaultSensorStatus.RUNNING)
+def refresh_yt_channels_sensor(context):
+    """Refresh the channel partitions with new uploads in their RSS feed, one run each.
+
+    Each feed is polled on its own cadence, learned from how often the channel posts and staggered between channels,
+    and at most FEED_POLL_BATCH due feeds are polled per tick, most overdue first. A run is requested once per newest
+    new upload. Channels without a usable feed are refreshed when due for polling and their cached listing expired.
+    Channels with items ready in the download queue (retries past their backoff, videos deferred by planning) and
+    untouched for QUEUE_RUN_INTERVAL are refreshed as well, at most once per interval, so they never wait for a new
+    upload.
+    """
+    # imported on the first tick rather than with the definitions, as they load yt_dlp and SQLAlchemy
+    from ..youtube.feeds import poll_channel_feed
+    from ..youtube.history import get_history_store, get_video_id
+    from ..youtube.queue import DownloadQueue
+
+    store = get_history_store()
+    partitions = set(context.instance.get_dynamic_partitions(yt_channel_partitions.name))
+    yt_chan_list = [sub for sub in load_yt_subs_config() if sub.channel in partitions]
+    states = store.get_channel_states([sub.url for sub in yt_chan_list])
+    now = dt.datetime.now().astimezone()
+    never = dt.datetime.min.replace(tzinfo=dt.timezone.utc)
+
+    def next_check(sub: Subscription) -> dt.datetime:
+        return to_aware((states.get(sub.url) or {}).get("next_feed_check_at")) or never
+
+    due = sorted([x for x in yt_chan_list if next_check(x) <= now], key=next_check)[:FEED_POLL_BATCH]
+
+    def poll(sub: Subscription):
+        state = states.get(sub.url)
+        try:
+            new_urls = poll_channel_feed(store, sub.url, sub.channel, state, now)
+        except Exception as e:
+            context.log.warning(f"Polling the feed of {sub.channel} failed: {e}")
+            return None
+        if new_urls is None and listing_due(state, now):
+            return RunRequest(partition_key=sub.channel)
+        if new_urls:
+            run_key = f"{sub.channel}:{get_video_id(new_urls[0])}"
+            return RunRequest(run_key=run_key, partition_key=sub.channel)
+        return None
+
+    with ThreadPoolExecutor(FEED_WORKERS, thread_name_prefix="ytdl-feeds") as executor:
+        run_requests = [x for x in executor.map(poll, due) if x is not None]
+    requested = {x.partition_key for x in run_requests}
+    idle_since = dt.datetime.now() - dt.timedelta(seconds=QUEUE_RUN_INTERVAL)
+    ready = DownloadQueue(store).ready_by_subscription(updated_before=idle_since)
+    interval = int(now.timestamp()) // max(QUEUE_RUN_INTERVAL, 1)
+    queued = [sub for sub in yt_chan_list if ready.get(sub.url) and sub.channel not in requested]
+    run_requests.extend(
+        RunRequest(run_key=f"{sub.channel}:queue:{interval}", partition_key=sub.channel) for sub in queued
+    )
+    if len(due) == 0 and len(queued) == 0:
+        return SkipReason("No channel feed is due for polling and no queued download is waiting")
+    context.log.info(
+        f"Polled {len(due)} feed(s), {len(queued)} channel(s) with queued downloads, {len(run_requests)} to refresh"
+    )
+    return SensorResult(run_requests=run_requests)
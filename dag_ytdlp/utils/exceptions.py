@@ -6,3 +6,11 @@ class EnvVarMissingError(KeyError):
 
     def __init__(self, message):
         super().__init__(message)
+
+
+class SubscriptionConfigError(ValueError):
+    """Raise when the subscriptions YAML is missing or invalid."""
+
+
+class SyncVerificationError(OSError):
+    """Raise when a file copied to the NAS does not match its source."""
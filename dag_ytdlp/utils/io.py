@@ -1,12 +1,23 @@
 import json
 import logging
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Iterator
 
 import yaml
 
 logger = logging.getLogger("ytdl_logger")
 
+# Files written next to each video by YDL_OPTS_ALL, deleted together with their video
+SUBTITLE_SUFFIXES = (".vtt", ".srt", ".ass")
+SIDECAR_SUFFIXES = (".info.json", ".description", ".jpg", ".jpeg", ".png", ".webp") + SUBTITLE_SUFFIXES
+
+CLEANUP_WORKERS = 8
+
 
 def json_to_dict(path: str):
     with open(path, "r") as f:
@@ -14,18 +25,109 @@ def json_to_dict(path: str):
     return d
 
 
-def delete_legacy_files(ch_path: Path, ephemeral_days: int):
-    """Scan the ch_path for subdir and remove all files from each subdir if older than ephemeral_days."""
-    threshold_date = datetime.now() - timedelta(days=ephemeral_days)
-    for child_dir in ch_path.iterdir():
-        if child_dir.is_dir():
-            for file_path in child_dir.iterdir():
-                if file_path.is_file():
-                    creation_time = file_path.stat().st_ctime
-                    creation_date = datetime.fromtimestamp(creation_time)
-                    if creation_date < threshold_date:
-                        file_path.unlink()
-                        logger.info(f"{str(file_path)} deleted from YT library")
+def scan_files(path: Path) -> Iterator[os.DirEntry]:
+    """Recursively yield the files under path, with stat results cached by os.scandir."""
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def media_key(file_path: str) -> str:
+    """Return the path shared by a video and its sidecar files (.info.json, description, thumbnail, subtitles)."""
+    name = file_path
+    for suffix in SIDECAR_SUFFIXES:
+        if name.lower().endswith(suffix):
+            name = name[: -len(suffix)]
+            # subtitles carry a language code, e.g. "title.en.vtt"
+            if suffix in SUBTITLE_SUFFIXES:
+                name = re.sub(r"\.[A-Za-z-]{2,8}$", "", name)
+            return name
+    return os.path.splitext(name)[0]
+
+
+def find_legacy_files(ch_path: Path, ephemeral_days: int) -> list[tuple[str, int]]:
+    """Scan ch_path at any depth and return (path, size) of files older than ephemeral_days.
+
+    A video and its sidecar files are grouped and expire together, based on the age of the video.
+    """
+    threshold = (datetime.now() - timedelta(days=ephemeral_days)).timestamp()
+    groups = defaultdict(list)
+    for entry in scan_files(ch_path):
+        groups[media_key(entry.path)].append(entry)
+    expired = []
+    for files in groups.values():
+        videos = [entry for entry in files if not entry.name.lower().endswith(SIDECAR_SUFFIXES)]
+        # orphaned sidecars expire on their own age
+        reference = videos if len(videos) > 0 else files
+        if max(entry.stat().st_ctime for entry in reference) < threshold:
+            expired.extend((entry.path, entry.stat().st_size) for entry in files)
+    return expired
+
+
+def delete_legacy_files(ch_path: Path, ephemeral_days: int, dry_run: bool = False) -> int:
+    """Remove all files under ch_path older than ephemeral_days, together with their sidecar files.
+
+    Returns the number of bytes reclaimed, or reclaimable if dry_run is True.
+    """
+    reclaimed = 0
+    for file_path, size in find_legacy_files(ch_path, ephemeral_days):
+        if dry_run:
+            logger.info(f"{file_path} would be deleted from YT library")
+        else:
+            try:
+                os.unlink(file_path)
+            except FileNotFoundError:
+                continue
+            logger.info(f"{file_path} deleted from YT library")
+        reclaimed += size
+    return reclaimed
+
+
+def delete_with_sidecars(file_path: Path) -> list[str]:
+    """Delete file_path and the sidecar files written next to it, returning the paths deleted.
+
+    Sidecars are the files of the folder sharing the media key of file_path, so subtitles are matched whatever their
+    language code (e.g. "title.en.vtt").
+    """
+    key = media_key(str(file_path))
+    try:
+        with os.scandir(file_path.parent) as it:
+            siblings = [entry.path for entry in it if not entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+    candidates = [path for path in siblings if media_key(path) == key]
+    deleted = []
+    for candidate in candidates:
+        try:
+            os.unlink(candidate)
+        except FileNotFoundError:
+            continue
+        deleted.append(candidate)
+        logger.info(f"{candidate} deleted from YT library")
+    return deleted
+
+
+def delete_legacy_files_concurrently(
+    ch_paths: list[Path], ephemeral_days: int, dry_run: bool = False, max_workers: int = CLEANUP_WORKERS
+) -> dict[str, int]:
+    """Run delete_legacy_files on each of ch_paths in a bounded thread pool.
+
+    Returns the bytes reclaimed (or reclaimable if dry_run is True) per channel path.
+    """
+    with ThreadPoolExecutor(max_workers, thread_name_prefix="ytdl-cleanup") as executor:
+        futures = {
+            str(ch_path): executor.submit(delete_legacy_files, ch_path, ephemeral_days, dry_run) for ch_path in ch_paths
+        }
+    report = {}
+    for ch_path, future in futures.items():
+        if future.exception() is not None:
+            logger.warning(f"Cleaning {ch_path} failed: {future.exception()}")
+        else:
+            report[ch_path] = future.result()
+    return report
 
 
 class BlankLineDumper(yaml.Dumper):
@@ -38,20 +140,3 @@ class BlankLineDumper(yaml.Dumper):
         if len(self.indents) == 1:
             super(BlankLineDumper, self).write_line_break()
         super(BlankLineDumper, self).write_line_break(data)
-
-
-def load_yaml(path: str):
-    """Load a yaml file.
-
-    Will resolve to simplest representation, typically a dict.
-    """
-    try:
-        with open(path, "r") as file:
-            data = yaml.safe_load(file)
-        return data
-    except FileNotFoundError:
-        print(f"File {path} not found.")
-        return None
-    except yaml.YAMLError as exc:
-        print(f"Error parsing YAML file: {exc}")
-        return None
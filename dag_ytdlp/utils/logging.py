@@ -1,22 +1,24 @@
 import logging
 from os import environ
-from pathlib import Path
 
 from .datetime import now
 
-LOG_PATH = environ["LOG_HOME"]
-NOW = now()
-
 
 def setup_logging():
-    """Initialize logging for compatiblity with dagster."""
+    """Initialize logging for compatiblity with dagster.
+
+    Records go to a daily file under LOG_HOME, opened on the first record so loading the Dagster definitions never
+    touches it. Without LOG_HOME, records only propagate to the root logger. Safe to call more than once.
+    """
     logger = logging.getLogger("ytdl_logger")
-    log_fname = f"{LOG_PATH}/ytdl/{NOW}.log"
-    Path(log_fname).touch(exist_ok=True)
-    handler = logging.FileHandler(log_fname, mode="a", encoding="utf-8")
+    logger.setLevel(logging.INFO)
+    log_home = environ.get("LOG_HOME")
+    if log_home is None or any(isinstance(handler, logging.FileHandler) for handler in logger.handlers):
+        return logger
+    log_fname = f"{log_home}/ytdl/{now()}.log"
+    handler = logging.FileHandler(log_fname, mode="a", encoding="utf-8", delay=True)
     formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s: %(message)s", datefmt="%Y-%m-%d %I:%M:%S %p")
     handler.setFormatter(formatter)
     logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
 
     return logger
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from ..config.ytdl import YT_NAS_PATH, get_downloads_path
+from .history import HistoryStore, get_video_id
+from .sync import media_files
+
+HARDLINK = "hardlink"
+SYMLINK = "symlink"
+
+logger = logging.getLogger("ytdl_logger")
+
+
+def linked_path(file_path: str, source_channel: str, channel: str, parent: Optional[str] = None) -> str:
+    """Return where file_path, downloaded for source_channel, goes in the folder of channel under parent.
+
+    The part of the path below the source channel's folder (season folder and file name) is kept.
+    """
+    parts = Path(file_path).parts
+    tail = parts[parts.index(source_channel) + 1 :] if source_channel in parts[:-1] else parts[-1:]
+    head = (parent, channel) if parent else (channel,)
+    return str(Path(*head, *tail))
+
+
+def link_file(src: Path, dest: Path, mode: str):
+    """Link dest to src, as a hardlink or a relative symlink. Does nothing if dest exists.
+
+    Falls back to a symlink where hardlinks are not supported, e.g. across file systems.
+    """
+    if dest.exists() or dest.is_symlink():
+        return None
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if mode == HARDLINK:
+        try:
+            return os.link(src, dest)
+        except OSError as e:
+            logger.debug(f"Hardlinking {dest} failed, symlinking instead: {e}")
+    os.symlink(os.path.relpath(src, dest.parent), dest)
+
+
+def link_source(sources: list[dict]) -> tuple[Optional[dict], Optional[str]]:
+    """Return the history row of a video to link to and the root its file is under, or None, None if there is none.
+
+    Synced videos are linked in YT_NAS_PATH, others in YT_DOWNLOADS_PATH if the NAS is not used.
+    """
+    for source in sources:
+        if source["file_path"] is None or source["deleted_at"] is not None:
+            continue
+        if source["synced_at"] is not None and YT_NAS_PATH is not None:
+            root = YT_NAS_PATH
+        elif source["synced_at"] is None and YT_NAS_PATH is None:
+            root = get_downloads_path()
+        else:
+            continue
+        if Path(root, source["file_path"]).exists():
+            return source, root
+    return None, None
+
+
+def link_download(url: str, source: dict, root: str, channel: str, parent: Optional[str], mode: str) -> dict:
+    """Link the files of a video downloaded by another channel into the folder of channel, returning its history row."""
+    src = Path(root, source["file_path"])
+    file_path = linked_path(source["file_path"], source["channel"], channel, parent)
+    dest = Path(root, file_path)
+    for path in media_files(src):
+        link_file(path, dest.parent / path.name, mode)
+    logger.info(f"{url} for channel {channel} linked to the download of {source['channel']}")
+    return {
+        "url": url,
+        "channel": channel,
+        "download_date": dt.datetime.now(),
+        "file_path": file_path,
+        "file_size": source["file_size"],
+        "synced_at": dt.datetime.now() if root == YT_NAS_PATH else None,
+    }
+
+
+def link_existing_downloads(
+    store: HistoryStore, urls: set[str], channel: str, parent: Optional[str], mode: str
+) -> set[str]:
+    """Link the videos of urls downloaded by other channels but not by channel, recording them in history.
+
+    Returns the URLs to link later: videos only downloaded by other channels and still waiting to be synced, so the
+    link is made next to the synced file on the NAS.
+    """
+    located = store.locate(urls)
+    rows = []
+    waiting = set()
+    for url in urls:
+        sources = located.get(get_video_id(url), [])
+        if len(sources) == 0 or any(source["channel"] == channel for source in sources):
+            continue
+        source, root = link_source(sources)
+        if source is None:
+            if any(x["synced_at"] is None and x["deleted_at"] is None and x["file_path"] for x in sources):
+                waiting.add(url)
+            continue
+        try:
+            rows.append(link_download(url, source, root, channel, parent, mode))
+        except OSError as e:
+            logger.warning(f"Linking {url} for channel {channel} failed: {e}")
+            waiting.add(url)
+    store.record_many(rows)
+    return waiting
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import datetime as dt
+import re
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+import zlib
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+from yt_dlp import YoutubeDL
+
+from ..config.ytdl import FEED_POLL_FRACTION, FEED_POLL_MAX, FEED_POLL_MIN, FEED_TIMEOUT
+from .history import HistoryStore
+from .listing import to_aware
+from .queue import DownloadQueue
+
+FEED_URL = "https://www.youtube.com/feeds/videos.xml"
+
+CHANNEL_ID_PATTERN = re.compile(r"/channel/(UC[0-9A-Za-z_-]{22})")
+
+# Atom namespaces of YouTube feeds
+NAMESPACES = {"atom": "http://www.w3.org/2005/Atom", "yt": "http://www.youtube.com/xml/schemas/2015"}
+
+
+class Feed(NamedTuple):
+    """Result of polling a feed: video IDs newest first, or None if unchanged since the last poll."""
+
+    video_ids: Optional[list[str]]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+def resolve_feed_url(url: str, ydl_class=YoutubeDL) -> Optional[str]:
+    """Return the RSS feed URL of a YouTube channel or playlist URL, or None for other URLs.
+
+    Playlist and /channel/ URLs are resolved from the URL itself, handles (/@name) with a single flat extraction.
+    """
+    if "youtube.com" not in urlparse(url).netloc:
+        return None
+    playlist_id = parse_qs(urlparse(url).query).get("list")
+    if playlist_id:
+        return f"{FEED_URL}?playlist_id={playlist_id[0]}"
+    match = CHANNEL_ID_PATTERN.search(url)
+    if match is not None:
+        return f"{FEED_URL}?channel_id={match.group(1)}"
+    with ydl_class({"quiet": True, "extract_flat": True, "playlistend": 1}) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+    channel_id = None if info is None else info.get("channel_id")
+    if channel_id is None:
+        return None
+    return f"{FEED_URL}?channel_id={channel_id}"
+
+
+def fetch_feed(
+    feed_url: str, etag: Optional[str] = None, last_modified: Optional[str] = None, timeout: float = FEED_TIMEOUT
+) -> Feed:
+    """Poll a feed with a conditional GET, returning its video IDs newest first unless unchanged."""
+    request = urllib.request.Request(feed_url)
+    if etag is not None:
+        request.add_header("If-None-Match", etag)
+    if last_modified is not None:
+        request.add_header("If-Modified-Since", last_modified)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return Feed(None, etag, last_modified)
+        raise
+    root = ET.fromstring(body)
+    video_ids = [x.text for x in root.iterfind("atom:entry/yt:videoId", NAMESPACES) if x.text]
+    return Feed(video_ids, etag, last_modified)
+
+
+def feed_poll_interval(
+    url: str, posting_interval: Optional[float], last_new_video_at: Optional[dt.datetime], now: dt.datetime
+) -> dt.timedelta:
+    """Return the time until the next poll of a channel's feed.
+
+    FEED_POLL_FRACTION of the posting interval, or of the time since the last new video if longer, between
+    FEED_POLL_MIN and FEED_POLL_MAX. Channels never seen posting are polled every FEED_POLL_MIN. Each channel is
+    offset by up to 10% from a hash of its URL, so channels with the same cadence do not all poll on the same tick.
+    """
+    seconds = FEED_POLL_MIN
+    if posting_interval is not None and last_new_video_at is not None:
+        interval = max(posting_interval, (now - last_new_video_at).total_seconds())
+        seconds = min(max(interval * FEED_POLL_FRACTION, FEED_POLL_MIN), FEED_POLL_MAX)
+    stagger = (zlib.crc32(url.encode()) % 1000) / 10000
+    return dt.timedelta(seconds=seconds * (1 + stagger))
+
+
+def poll_channel_feed(
+    store: HistoryStore, url: str, channel: str, state: Optional[dict], now: dt.datetime
+) -> Optional[list[str]]:
+    """Poll the feed of a subscription, returning the URLs of its new uploads, or None if it has no usable feed.
+
+    New uploads are feed videos neither in history nor quarantined. When there are any, the cached listing of the
+    channel is expired so the next refresh lists it. The feed URL, its cache validators and the time of the next poll
+    are persisted in the channel state. Oldest first playlists have no usable feed, as new videos are past its end.
+    """
+    state = state or {}
+    interval = feed_poll_interval(url, state.get("posting_interval"), to_aware(state.get("last_new_video_at")), now)
+    values = {"channel": channel, "next_feed_check_at": now + interval}
+    feed_url = None
+    if not state.get("reverse_entries"):
+        feed_url = state.get("feed_url") or resolve_feed_url(url)
+    if feed_url is None:
+        store.set_channel_state(url, **values)
+        return None
+    try:
+        feed = fetch_feed(feed_url, state.get("feed_etag"), state.get("feed_last_modified"))
+    except Exception:
+        # still persist the next poll, so a failing feed is not polled on every tick
+        store.set_channel_state(url, **values)
+        raise
+    values.update(feed_url=feed_url, feed_etag=feed.etag, feed_last_modified=feed.last_modified)
+    new_urls = []
+    if feed.video_ids is not None:
+        urls = [f"https://www.youtube.com/watch?v={video_id}" for video_id in feed.video_ids]
+        skipped = store.downloaded(urls) | DownloadQueue(store).quarantined(urls)
+        new_urls = [x for x in urls if x not in skipped]
+    if len(new_urls) > 0:
+        values["next_listing_at"] = now
+    store.set_channel_state(url, **values)
+    return new_urls
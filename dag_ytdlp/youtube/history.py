@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import re
+import threading
+import time
+from contextlib import nullcontext
+from typing import Iterable, Optional
+
+import sqlalchemy as db
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..config.database import MAX_OVERFLOW, POOL_RECYCLE, POOL_SIZE, load_database_url
+from .metrics import DB_WRITE, ChannelMetrics
+from .tables import channels, download_queue, downloads
+
+# Number of candidate URLs sent per IN (...) query
+LOOKUP_CHUNK_SIZE = 500
+
+# Buffered history writes are flushed once either threshold is reached
+WRITE_BUFFER_ROWS = 50
+WRITE_BUFFER_SECONDS = 300
+
+VIDEO_ID_PATTERN = re.compile(r"(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})")
+
+logger = logging.getLogger("ytdl_logger")
+
+# Process-wide stores, keyed by connection settings
+_STORES: dict[tuple, HistoryStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_video_id(url: str) -> str:
+    """Return the YouTube video ID of url.
+
+    Falls back to the stripped url when no ID can be parsed, so non-YouTube URLs are still usable as keys.
+    """
+    match = VIDEO_ID_PATTERN.search(url)
+    if match is None:
+        return url.strip()
+    return match.group(1)
+
+
+def canonical_video_url(url: str) -> str:
+    """Return the watch URL of a YouTube video, or url unchanged if it is not a YouTube video."""
+    video_id = get_video_id(url)
+    if video_id == url.strip():
+        return video_id
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def chunked(items: list, size: int) -> Iterable[list]:
+    """Yield successive lists of at most size items."""
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def history_row(url: str, channel: str, file_path: Optional[str] = None, file_size: Optional[int] = None) -> dict:
+    """Return the downloads row of a video downloaded now.
+
+    The URL is kept as given, to match its download queue item, record_many stores it in canonical form.
+    """
+    return {
+        "url": url,
+        "channel": channel,
+        "download_date": dt.datetime.now(),
+        "file_path": file_path,
+        "file_size": file_size,
+    }
+
+
+class HistoryStore:
+    """Download history backed by a single pooled engine, keyed by video ID and channel.
+
+    Lookups only send the video IDs of the candidate URLs to the database, so a video is found whatever the form of
+    the URL it was reached through (channel, playlist, shorts or youtu.be link). When a run_id is provided, the full
+    history is instead loaded once into memory and shared by every lookup made with the same run_id through this store.
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = MAX_OVERFLOW,
+        pool_recycle: int = POOL_RECYCLE,
+        **engine_kwargs,
+    ):
+        """Initialize a new store.
+
+        Args:
+        ----
+            database_url (str, optional):
+                SQLAlchemy URL of the history database. Defaults to the PGSQL_* environment variables.
+            pool_size (int, optional):
+                Number of connections kept open in the pool. Defaults to POOL_SIZE from config.
+            max_overflow (int, optional):
+                Number of connections allowed above pool_size under load. Defaults to MAX_OVERFLOW from config.
+            pool_recycle (int, optional):
+                Seconds after which pooled connections are replaced. Defaults to POOL_RECYCLE from config.
+            **engine_kwargs:
+                Additional keyword arguments passed to sqlalchemy.create_engine.
+
+        """
+        if database_url is None:
+            database_url = load_database_url()
+        if not database_url.startswith("sqlite"):
+            engine_kwargs.update(pool_size=pool_size, max_overflow=max_overflow)
+        self.engine = db.create_engine(database_url, pool_recycle=pool_recycle, pool_pre_ping=True, **engine_kwargs)
+        self.table = downloads
+        self._snapshots: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def downloaded(self, urls: Iterable[str], run_id: Optional[str] = None) -> set[str]:
+        """Return the subset of urls whose video has already been downloaded.
+
+        If run_id is provided, answer from the in-memory snapshot of that run, checked in place under the lock
+        record_many updates it with, so no lookup copies it.
+        """
+        urls = list(urls)
+        if len(urls) == 0:
+            return set()
+        if run_id is not None:
+            with self._lock:
+                known_ids = self._snapshot(run_id)
+                return {url for url in urls if get_video_id(url) in known_ids}
+        known_ids = self._query_ids(urls)
+        return {url for url in urls if get_video_id(url) in known_ids}
+
+    def _snapshot(self, run_id: str) -> set[str]:
+        """Return the shared set of video IDs of the full history, loading it at most once per run.
+
+        Must be called with the lock held, and the set only used while it is.
+        """
+        if run_id not in self._snapshots:
+            self._snapshots.clear()
+            with self.engine.connect() as conn:
+                rslt = conn.execute(db.select(self.table.c.video_id))
+                self._snapshots[run_id] = {x[0] for x in rslt}
+        return self._snapshots[run_id]
+
+    def record(self, url: str, channel: str, file_path: Optional[str] = None, file_size: Optional[int] = None):
+        """Update history with video URL, channel and downloaded file."""
+        self.record_many([history_row(url, channel, file_path, file_size)])
+
+    def record_many(self, rows: list[dict]):
+        """Insert rows into history as a single multi-row statement, ignoring URLs already present.
+
+        Rows are keyed by the video ID of their URL, stored in canonical form. Matching download queue items, under
+        either form, are marked done in the same transaction.
+        """
+        if len(rows) == 0:
+            return None
+        urls = {row["url"] for row in rows}
+        rows = [{**row, "url": canonical_video_url(row["url"]), "video_id": get_video_id(row["url"])} for row in rows]
+        insert_stmt = self.insert().values(rows)
+        insert_stmt = insert_stmt.on_conflict_do_nothing(index_elements=[self.table.c.video_id, self.table.c.channel])
+        queue_stmt = (
+            db.update(download_queue)
+            .where(download_queue.c.url.in_(urls | {row["url"] for row in rows}))
+            .values(status="done", leased_by=None, leased_at=None, updated_at=dt.datetime.now())
+        )
+        with self.engine.begin() as conn:
+            conn.execute(insert_stmt)
+            conn.execute(queue_stmt)
+        with self._lock:
+            for snapshot in self._snapshots.values():
+                snapshot.update(row["video_id"] for row in rows)
+
+    def get_channel_state(self, url: str) -> Optional[dict]:
+        """Return the persisted state of a channel or playlist URL, or None if never stored."""
+        query = db.select(channels).where(channels.c.url == url)
+        with self.engine.connect() as conn:
+            row = conn.execute(query).mappings().first()
+        if row is None:
+            return None
+        return dict(row)
+
+    def get_channel_states(self, urls: Iterable[str]) -> dict[str, dict]:
+        """Return the persisted state of each of urls stored, keyed by URL."""
+        states = {}
+        with self.engine.connect() as conn:
+            for chunk in chunked(list(urls), LOOKUP_CHUNK_SIZE):
+                query = db.select(channels).where(channels.c.url.in_(chunk))
+                states.update({row["url"]: dict(row) for row in conn.execute(query).mappings()})
+        return states
+
+    def set_channel_state(self, url: str, **values):
+        """Insert or update the persisted state of a channel or playlist URL."""
+        values["updated_at"] = dt.datetime.now()
+        insert_stmt = self.insert(channels).values(url=url, **values)
+        upsert_stmt = insert_stmt.on_conflict_do_update(index_elements=[channels.c.url], set_=values)
+        with self.engine.begin() as conn:
+            conn.execute(upsert_stmt)
+
+    def locate(self, urls: Iterable[str]) -> dict[str, list[dict]]:
+        """Return the history rows of the videos of urls by video ID, one per channel that downloaded each video."""
+        video_ids = sorted({get_video_id(url) for url in urls})
+        c = self.table.c
+        located = {}
+        with self.engine.connect() as conn:
+            for chunk in chunked(video_ids, LOOKUP_CHUNK_SIZE):
+                query = db.select(self.table).where(c.video_id.in_(chunk)).order_by(c.download_date)
+                for row in conn.execute(query).mappings():
+                    located.setdefault(row["video_id"], []).append(dict(row))
+        return located
+
+    def expired_files(self, channel: str, before: dt.datetime) -> list[dict]:
+        """Return url, video_id, file_path and file_size of channel's files downloaded before, synced and not deleted.
+
+        Files not synced yet are still in the downloads folder, they expire once on the NAS.
+        """
+        c = self.table.c
+        query = db.select(c.url, c.video_id, c.channel, c.file_path, c.file_size).where(
+            c.channel == channel,
+            c.download_date < before,
+            c.file_path.is_not(None),
+            c.synced_at.is_not(None),
+            c.deleted_at.is_(None),
+        )
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def unsynced_files(self, limit: Optional[int] = None) -> list[dict]:
+        """Return url, video_id, channel, file_path and file_size of files not yet synced nor deleted, oldest first."""
+        c = self.table.c
+        query = (
+            db.select(c.url, c.video_id, c.channel, c.file_path, c.file_size)
+            .where(c.synced_at.is_(None), c.file_path.is_not(None), c.deleted_at.is_(None))
+            .order_by(c.download_date)
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def mark_synced(self, keys: list[tuple[str, str]]):
+        """Record that the files of keys, (video_id, channel) pairs, were transferred to the NAS."""
+        self._update_files(keys, synced_at=dt.datetime.now())
+
+    def mark_deleted(self, keys: list[tuple[str, str]]):
+        """Record that the files of keys, (video_id, channel) pairs, were deleted."""
+        self._update_files(keys, deleted_at=dt.datetime.now())
+
+    def _update_files(self, keys: list[tuple[str, str]], **values):
+        """Update the rows of keys, (video_id, channel) pairs, with values."""
+        key_columns = db.tuple_(self.table.c.video_id, self.table.c.channel)
+        with self.engine.begin() as conn:
+            for chunk in chunked(list(keys), LOOKUP_CHUNK_SIZE):
+                conn.execute(db.update(self.table).where(key_columns.in_(chunk)).values(**values))
+
+    def writer(
+        self,
+        max_rows: int = WRITE_BUFFER_ROWS,
+        max_seconds: float = WRITE_BUFFER_SECONDS,
+        metrics: Optional[ChannelMetrics] = None,
+    ) -> HistoryWriter:
+        """Return a buffered writer for this store, see HistoryWriter."""
+        return HistoryWriter(self, max_rows, max_seconds, metrics)
+
+    def insert(self, table: Optional[db.Table] = None):
+        """Return a dialect specific insert supporting ON CONFLICT, into the downloads table by default."""
+        if table is None:
+            table = self.table
+        if self.engine.dialect.name == "sqlite":
+            return sqlite.insert(table)
+        return postgresql.insert(table)
+
+    def _query_ids(self, urls: list[str]) -> set[str]:
+        """Query the history for the videos of urls only, returning the video IDs found."""
+        candidates = sorted({get_video_id(url) for url in urls})
+        known_ids = set()
+        with self.engine.connect() as conn:
+            for chunk in chunked(candidates, LOOKUP_CHUNK_SIZE):
+                query = db.select(self.table.c.video_id).where(self.table.c.video_id.in_(chunk)).distinct()
+                known_ids.update(x[0] for x in conn.execute(query))
+        return known_ids
+
+
+class HistoryWriter:
+    """Buffer successful downloads and write them to history in batches.
+
+    Rows are flushed in one transaction when max_rows are buffered, when the oldest buffered row is older than
+    max_seconds, and always when the writer is closed. Use as a context manager so completed downloads are
+    written even if the channel fails part way through.
+    """
+
+    def __init__(
+        self,
+        store: HistoryStore,
+        max_rows: int = WRITE_BUFFER_ROWS,
+        max_seconds: float = WRITE_BUFFER_SECONDS,
+        metrics: Optional[ChannelMetrics] = None,
+    ):
+        """Initialize a new writer.
+
+        Args:
+        ----
+            store (HistoryStore):
+                Store the buffered rows are written to.
+            max_rows (int, optional):
+                Number of buffered rows triggering a flush. Defaults to WRITE_BUFFER_ROWS.
+            max_seconds (float, optional):
+                Age in seconds of the oldest buffered row triggering a flush. Defaults to WRITE_BUFFER_SECONDS.
+            metrics (ChannelMetrics, optional):
+                Metrics flushes are timed in, as the db_write phase. Defaults to None, untimed.
+
+        """
+        self.store = store
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.metrics = metrics
+        self.rows = []
+        self._first_buffered = None
+        self._lock = threading.Lock()
+
+    def add(self, url: str, channel: str, file_path: Optional[str] = None, file_size: Optional[int] = None):
+        """Buffer a successful download, flushing if a threshold is reached."""
+        with self._lock:
+            if len(self.rows) == 0:
+                self._first_buffered = time.monotonic()
+            self.rows.append(history_row(url, channel, file_path, file_size))
+            full = len(self.rows) >= self.max_rows
+            stale = time.monotonic() - self._first_buffered >= self.max_seconds
+        if full or stale:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows in a single transaction."""
+        with self._lock:
+            rows, self.rows = self.rows, []
+        try:
+            with self.metrics.phase(DB_WRITE) if self.metrics is not None else nullcontext():
+                self.store.record_many(rows)
+        except Exception:
+            with self._lock:
+                self.rows = rows + self.rows
+            raise
+
+    def close(self):
+        """Flush any remaining rows."""
+        if len(self.rows) > 0:
+            logger.info(f"Writing {len(self.rows)} download(s) to history")
+        self.flush()
+
+    def __enter__(self):
+        """Return the writer, flushed on exit."""
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        """Flush the remaining rows, even if the block raised."""
+        self.close()
+
+
+def get_history_store(
+    database_url: Optional[str] = None, pool_size: int = POOL_SIZE, max_overflow: int = MAX_OVERFLOW
+) -> HistoryStore:
+    """Return the process-wide store for the given connection settings, creating it on first use.
+
+    database_url defaults to the PGSQL_* environment variables, read on the first call.
+    """
+    if database_url is None:
+        database_url = load_database_url()
+    key = (database_url, pool_size, max_overflow)
+    with _STORES_LOCK:
+        if key not in _STORES:
+            _STORES[key] = HistoryStore(database_url, pool_size, max_overflow)
+        return _STORES[key]
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import sqlalchemy as db
+
+from ..config.ytdl import INDEX_BATCH
+from ..utils.io import SIDECAR_SUFFIXES, media_key, scan_files
+from .history import LOOKUP_CHUNK_SIZE, HistoryStore, chunked
+from .tables import videos
+
+INFO_SUFFIX = ".info.json"
+# Season folders of the output template, "Season 24", or "Season 1" for order_seq channels
+SEASON_PATTERN = re.compile(r"Season \d+")
+
+logger = logging.getLogger("ytdl_logger")
+
+
+def parse_upload_date(value: Optional[str]) -> Optional[dt.date]:
+    """Return the date of a yt-dlp upload_date (YYYYMMDD), or None if missing or invalid."""
+    try:
+        return dt.datetime.strptime(value, "%Y%m%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def library_folders(info_path: str) -> tuple[Optional[str], Optional[str]]:
+    """Return the parent and channel folders of a sidecar path relative to the library root, None where absent.
+
+    Follows the output template, [parent/]channel/[Season NN/]file, so downloads without a parent folder (e.g.
+    MISC/Season 24/x.info.json from download_from_url) are not mistaken for a parent and a season channel.
+    """
+    folders = Path(info_path).parts[:-1]
+    if len(folders) > 0 and SEASON_PATTERN.fullmatch(folders[-1]):
+        folders = folders[:-1]
+    channel = folders[-1] if len(folders) > 0 else None
+    parent = folders[-2] if len(folders) > 1 else None
+    return parent, channel
+
+
+def info_row(info_path: str, info: dict, mtime: float, video: Optional[os.DirEntry], root: str) -> dict:
+    """Return the videos row of a parsed .info.json at info_path, relative to root, and its video file."""
+    parent, channel = library_folders(info_path)
+    duration = info.get("duration")
+    return {
+        "info_path": info_path,
+        "video_id": info.get("id"),
+        "url": info.get("webpage_url"),
+        "parent": parent,
+        "channel": channel or info.get("channel"),
+        "title": info.get("title"),
+        "upload_date": parse_upload_date(info.get("upload_date")),
+        "duration": round(duration) if isinstance(duration, (int, float)) else None,
+        "file_path": os.path.relpath(video.path, root) if video is not None else None,
+        "file_size": video.stat().st_size if video is not None else None,
+        "source_mtime": mtime,
+        "indexed_at": dt.datetime.now(),
+    }
+
+
+def scan_sidecars(root: str) -> Iterator[tuple[os.DirEntry, Optional[os.DirEntry]]]:
+    """Yield each .info.json under root with the video it was written for, or None if the video is gone."""
+    groups = defaultdict(list)
+    for entry in scan_files(Path(root)):
+        if entry.name.endswith((".part", ".ytdl")):
+            continue
+        groups[media_key(entry.path)].append(entry)
+    for files in groups.values():
+        infos = [entry for entry in files if entry.name.endswith(INFO_SUFFIX)]
+        if len(infos) == 0:
+            continue
+        media = [entry for entry in files if not entry.name.lower().endswith(SIDECAR_SUFFIXES)]
+        video = max(media, key=lambda entry: entry.stat().st_size) if len(media) > 0 else None
+        yield infos[0], video
+
+
+class VideoIndex:
+    """Queryable index of the videos in the library, built from the .info.json sidecars written by yt-dlp.
+
+    Only sidecars added or modified (or whose video was) since they were last indexed are parsed, so a refresh costs a
+    walk of the tree (directory listings and stat calls) plus the JSON of new videos. Rows of deleted sidecars are
+    removed.
+    """
+
+    def __init__(self, store: HistoryStore):
+        """Initialize an index stored in the database of store."""
+        self.store = store
+        self.engine = store.engine
+        self.table = videos
+
+    def mtimes(self) -> dict[str, float]:
+        """Return the mtime each indexed sidecar was indexed at, the latest of the sidecar and its video, by path."""
+        query = db.select(self.table.c.info_path, self.table.c.source_mtime)
+        with self.engine.connect() as conn:
+            return {row[0]: row[1] for row in conn.execute(query)}
+
+    def upsert(self, rows: list[dict]):
+        """Insert rows, replacing those already indexed under the same info_path."""
+        if len(rows) == 0:
+            return None
+        insert_stmt = self.store.insert(self.table).values(rows)
+        update = {name: insert_stmt.excluded[name] for name in rows[0] if name != "info_path"}
+        upsert_stmt = insert_stmt.on_conflict_do_update(index_elements=[self.table.c.info_path], set_=update)
+        with self.engine.begin() as conn:
+            conn.execute(upsert_stmt)
+
+    def remove(self, info_paths: Iterable[str]):
+        """Remove the rows of info_paths."""
+        with self.engine.begin() as conn:
+            for chunk in chunked(list(info_paths), LOOKUP_CHUNK_SIZE):
+                conn.execute(db.delete(self.table).where(self.table.c.info_path.in_(chunk)))
+
+    def refresh(self, root: str, full: bool = False, batch_size: int = INDEX_BATCH) -> dict:
+        """Index the sidecars under root added or modified since last indexed, or all of them if full is True.
+
+        Rows are written batch_size at a time. Returns the number of sidecars indexed, unchanged, failed to parse
+        and removed.
+        """
+        known = {} if full else self.mtimes()
+        seen = set()
+        report = {"indexed": 0, "unchanged": 0, "failed": 0, "removed": 0}
+        rows = []
+        for info, video in scan_sidecars(root):
+            info_path = os.path.relpath(info.path, root)
+            seen.add(info_path)
+            # a video converted or synced after its sidecar changes the row as well
+            mtime = max(info.stat().st_mtime, video.stat().st_mtime if video is not None else 0)
+            if known.get(info_path) == mtime:
+                report["unchanged"] += 1
+                continue
+            try:
+                with open(info.path, "rb") as f:
+                    rows.append(info_row(info_path, json.load(f), mtime, video, root))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Indexing {info.path} failed: {e}")
+                report["failed"] += 1
+                continue
+            if len(rows) >= batch_size:
+                self.upsert(rows)
+                report["indexed"] += len(rows)
+                rows = []
+        self.upsert(rows)
+        report["indexed"] += len(rows)
+        removed = set(known if not full else self.mtimes()) - seen
+        self.remove(removed)
+        report["removed"] = len(removed)
+        return report
+
+    def usage_by_channel(self) -> dict[str, dict]:
+        """Return the number of videos, bytes and seconds of video indexed per channel, largest first."""
+        c = self.table.c
+        query = (
+            db.select(
+                c.channel,
+                db.func.count().label("videos"),
+                db.func.coalesce(db.func.sum(c.file_size), 0).label("bytes"),
+                db.func.coalesce(db.func.sum(c.duration), 0).label("seconds"),
+            )
+            .group_by(c.channel)
+            .order_by(db.desc("bytes"))
+        )
+        with self.engine.connect() as conn:
+            return {
+                row["channel"]: {k: row[k] for k in ("videos", "bytes", "seconds")}
+                for row in conn.execute(query).mappings()
+            }
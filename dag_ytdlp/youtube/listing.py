@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import Optional
+
+from ..config.ytdl import LISTING_TTL_FRACTION, LISTING_TTL_MAX, LISTING_TTL_MIN
+
+
+def to_aware(ts: Optional[dt.datetime]) -> Optional[dt.datetime]:
+    """Return ts as a timezone aware datetime, assuming local time for naive values."""
+    if ts is None or ts.tzinfo is not None:
+        return ts
+    return ts.astimezone()
+
+
+def update_posting_interval(
+    posting_interval: Optional[float], last_new_video_at: Optional[dt.datetime], now: dt.datetime
+) -> Optional[float]:
+    """Return the posting interval in seconds after new videos were found at now.
+
+    The interval is an exponential moving average of the time between listings finding new videos.
+    """
+    if last_new_video_at is None:
+        return posting_interval
+    interval = (now - last_new_video_at).total_seconds()
+    if posting_interval is None:
+        return interval
+    return 0.5 * posting_interval + 0.5 * interval
+
+
+def listing_ttl(
+    posting_interval: Optional[float], last_new_video_at: Optional[dt.datetime], now: dt.datetime
+) -> dt.timedelta:
+    """Return how long a listing stays fresh for a channel with the given posting history.
+
+    Channels never seen posting are always listed. Otherwise the TTL is LISTING_TTL_FRACTION of the posting interval,
+    or of the time since the last new video if longer, so idle channels are polled less and less often.
+    """
+    if posting_interval is None or last_new_video_at is None:
+        return dt.timedelta(seconds=LISTING_TTL_MIN)
+    interval = max(posting_interval, (now - last_new_video_at).total_seconds())
+    seconds = min(max(interval * LISTING_TTL_FRACTION, LISTING_TTL_MIN), LISTING_TTL_MAX)
+    return dt.timedelta(seconds=seconds)
+
+
+def listing_due(state: Optional[dict], now: dt.datetime) -> bool:
+    """Return True if a channel with the given persisted state must be listed again at now."""
+    if state is None or state.get("next_listing_at") is None:
+        return True
+    return to_aware(state["next_listing_at"]) <= now
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from ..config.ytdl import METRICS_PORT
+
+# Phases timed for every channel
+LISTING = "listing"
+UPLOAD_DATE_PROBE = "upload_date_probe"
+HISTORY_QUERY = "history_query"
+DOWNLOAD = "download"
+POSTPROCESS = "postprocess"
+DB_WRITE = "db_write"
+PHASES = (LISTING, UPLOAD_DATE_PROBE, HISTORY_QUERY, DOWNLOAD, POSTPROCESS, DB_WRITE)
+
+logger = logging.getLogger("ytdl_logger")
+
+_SERVER: Optional[ThreadingHTTPServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+class MetricsRegistry:
+    """Process-wide totals of every channel's metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self.phase_seconds = defaultdict(float)
+        self.phase_calls = defaultdict(int)
+        self.downloaded_bytes = defaultdict(int)
+        self.videos = defaultdict(int)
+        self.queue_depth = {}
+        self._lock = threading.Lock()
+
+    def set_queue_depth(self, stage: str, depth: int):
+        """Set the number of items waiting for a worker in pipeline stage."""
+        with self._lock:
+            self.queue_depth[stage] = depth
+
+    def add_phase(self, channel: str, phase: str, seconds: float):
+        """Add seconds spent by channel in phase."""
+        with self._lock:
+            self.phase_seconds[(channel, phase)] += seconds
+            self.phase_calls[(channel, phase)] += 1
+
+    def add_video(self, channel: str, size: int):
+        """Count a video of channel downloaded with size bytes."""
+        with self._lock:
+            self.downloaded_bytes[channel] += size
+            self.videos[channel] += 1
+
+    def render(self) -> str:
+        """Return all totals in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = [
+                ("ytdl_phase_seconds_total", "Seconds spent per channel and phase", self.phase_seconds),
+                ("ytdl_phase_calls_total", "Timed calls per channel and phase", self.phase_calls),
+                ("ytdl_downloaded_bytes_total", "Bytes downloaded per channel", self.downloaded_bytes),
+                ("ytdl_videos_downloaded_total", "Videos downloaded per channel", self.videos),
+            ]
+            for name, help_text, values in metrics:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(values.items()):
+                    if isinstance(key, tuple):
+                        labels = f'channel="{_escape(key[0])}",phase="{key[1]}"'
+                    else:
+                        labels = f'channel="{_escape(key)}"'
+                    lines.append(f"{name}{{{labels}}} {value}")
+            lines.append("# HELP ytdl_queue_depth Items waiting for a worker per pipeline stage")
+            lines.append("# TYPE ytdl_queue_depth gauge")
+            for stage, depth in sorted(self.queue_depth.items()):
+                lines.append(f'ytdl_queue_depth{{stage="{stage}"}} {depth}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class ChannelMetrics:
+    """Per-phase timings, bytes downloaded and throughput of one channel, safe to update from download threads.
+
+    Every update is also added to the process-wide REGISTRY served by the metrics endpoint.
+    """
+
+    def __init__(self, channel: Optional[str], registry: MetricsRegistry = REGISTRY):
+        """Initialize empty metrics for channel."""
+        self.channel = channel or ""
+        self.registry = registry
+        self.seconds = defaultdict(float)
+        self.videos = {}
+        self.max_queue_depth = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, exclude: tuple[str, ...] = ()):
+        """Time the enclosed block as phase name, less the time recorded meanwhile in the exclude phases."""
+        excluded = self.total(exclude)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start - (self.total(exclude) - excluded))
+
+    def total(self, names: tuple[str, ...]) -> float:
+        """Return the seconds spent in the phases names."""
+        with self._lock:
+            return sum(self.seconds[name] for name in names)
+
+    def add(self, name: str, seconds: float):
+        """Add seconds spent in phase name."""
+        with self._lock:
+            self.seconds[name] += seconds
+        self.registry.add_phase(self.channel, name, seconds)
+
+    def observe_queue_depth(self, stage: str, depth: int):
+        """Record the queue depth of pipeline stage seen by this channel, keeping the maximum."""
+        with self._lock:
+            self.max_queue_depth[stage] = max(self.max_queue_depth[stage], depth)
+
+    def record_video(self, url: str, size: int, download_seconds: float, postprocess_seconds: float):
+        """Record the bytes and timings of a downloaded video."""
+        with self._lock:
+            self.videos[url] = {
+                "bytes": size,
+                "download_seconds": round(download_seconds, 3),
+                "postprocess_seconds": round(postprocess_seconds, 3),
+                "bytes_per_second": round(size / download_seconds) if download_seconds > 0 else None,
+            }
+        self.registry.add_video(self.channel, size)
+
+    def as_metadata(self) -> dict:
+        """Return the metrics as Dagster metadata values."""
+        with self._lock:
+            size = sum(video["bytes"] for video in self.videos.values())
+            metadata = {f"seconds_{name}": round(self.seconds[name], 3) for name in PHASES}
+            metadata["videos_downloaded"] = len(self.videos)
+            metadata["bytes_downloaded"] = size
+            if self.seconds[DOWNLOAD] > 0:
+                metadata["bytes_per_second"] = round(size / self.seconds[DOWNLOAD])
+            for stage, depth in sorted(self.max_queue_depth.items()):
+                metadata[f"max_queue_depth_{stage}"] = depth
+            if len(self.videos) > 0:
+                metadata["videos"] = dict(self.videos)
+        return metadata
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve REGISTRY on every GET request."""
+
+    def do_GET(self):
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return None
+
+
+def start_metrics_server(port: Optional[int] = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """Serve REGISTRY on port from a daemon thread, once per process. Does nothing if port is None.
+
+    Only the first process to bind the port serves metrics, others log and carry on.
+    """
+    global _SERVER
+    if port is None:
+        return None
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            try:
+                _SERVER = ThreadingHTTPServer(("", port), _MetricsHandler)
+            except OSError as e:
+                logger.debug(f"Metrics endpoint not started on port {port}: {e}")
+                return None
+            threading.Thread(target=_SERVER.serve_forever, name="ytdl-metrics", daemon=True).start()
+        return _SERVER
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import dataclasses
+import functools
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from ..config.ytdl import YDL_OPTS_BEST, YDL_OPTS_DEFAULT, get_downloads_path
+
+# Parts of the output template replaced for channels using playlist indexes (order_seq)
+EPISODE_TEMPLATE = "E%(upload_date>%m%d)s"
+SEASON_TEMPLATES = {"Season %(upload_date>%y)s": "Season 1", "S%(upload_date>%y)s": "S1"}
+
+
+def freeze(value: Any) -> Any:
+    """Return a read-only copy of value, with dicts as mappingproxy and lists as tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Return a mutable copy of a value made by freeze, for options YoutubeDL may modify."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+@dataclasses.dataclass(frozen=True)
+class ChannelOptions:
+    """yt-dlp options of a channel, resolved once and never modified.
+
+    The output template is resolved for the channel's name, parent folder and season numbering when built. Options
+    of a single download are created by for_video as a new top level dict, sharing the frozen nested values.
+    """
+
+    params: Mapping[str, Any]
+    outtmpl: str
+    # output template split around the episode number once, so a playlist index is inserted without rewriting it
+    episode_parts: Optional[tuple[str, ...]] = None
+
+    @classmethod
+    def build(
+        cls,
+        channel: Optional[str] = None,
+        parent: Optional[str] = None,
+        order_seq: bool = False,
+        best_format: bool = False,
+    ) -> ChannelOptions:
+        """Return the options of a channel, see YT_Channel for the arguments."""
+        return _build_channel_options(channel, parent, order_seq, best_format)
+
+    @property
+    def playlistend(self) -> int:
+        """Index of the last playlist entry listed."""
+        return self.params["playlistend"]
+
+    def with_playlistend(self, playlistend: int) -> ChannelOptions:
+        """Return a copy listing up to playlistend entries."""
+        return dataclasses.replace(self, params=MappingProxyType({**self.params, "playlistend": playlistend}))
+
+    def for_listing(self) -> dict:
+        """Return options for listing the channel, the same as downloads so pooled instances are shared."""
+        return self.for_video()
+
+    def for_video(self, playlist_idx: Optional[int] = None, **overrides) -> dict:
+        """Return options for downloading one video, numbered playlist_idx if given, updated with overrides."""
+        outtmpl = self.outtmpl
+        if playlist_idx is not None and self.episode_parts is not None:
+            outtmpl = f"E{playlist_idx}".join(self.episode_parts)
+        ydl_opts = {**self.params, "outtmpl": outtmpl, **overrides}
+        # the only nested options yt-dlp modifies
+        if "postprocessors" in ydl_opts:
+            ydl_opts["postprocessors"] = thaw(ydl_opts["postprocessors"])
+        return ydl_opts
+
+
+@functools.lru_cache(maxsize=None)
+def _build_channel_options(
+    channel: Optional[str], parent: Optional[str], order_seq: bool, best_format: bool
+) -> ChannelOptions:
+    """Resolve and freeze the options of a channel, cached as they never change."""
+    base_opts = YDL_OPTS_BEST if best_format else YDL_OPTS_DEFAULT
+    outtmpl = base_opts["outtmpl"]
+    # YoutubeDL rewrites a string outtmpl into a dict in place when given the config dicts directly
+    if not isinstance(outtmpl, str):
+        outtmpl = outtmpl["default"]
+    outtmpl = f"{get_downloads_path()}/{outtmpl}"
+    if parent is not None:
+        outtmpl = outtmpl.replace("%(channel)s", f"{parent}/%(channel)s")
+    if channel is not None:
+        outtmpl = outtmpl.replace("%(channel)s", f"{channel}")
+    episode_parts = None
+    if order_seq:
+        for template, replacement in SEASON_TEMPLATES.items():
+            outtmpl = outtmpl.replace(template, replacement)
+        episode_parts = tuple(outtmpl.split(EPISODE_TEMPLATE))
+    params = freeze({k: v for k, v in base_opts.items() if k != "outtmpl"})
+    return ChannelOptions(params, outtmpl, episode_parts)
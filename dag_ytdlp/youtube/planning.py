@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+from typing import Optional
+
+from ..config.ytdl import (
+    BITRATE_BEST,
+    BITRATE_DEFAULT,
+    DISK_RESERVE_BYTES,
+    FALLBACK_VIDEO_BYTES,
+    RUN_BYTE_BUDGET,
+    get_downloads_path,
+)
+
+logger = logging.getLogger("ytdl_logger")
+
+
+def estimate_size(entry: dict, best_format: bool = False) -> int:
+    """Estimate the bytes a video will take once downloaded, from its yt-dlp metadata.
+
+    Uses filesize or filesize_approx when present, otherwise the duration at the expected bitrate of the format,
+    otherwise FALLBACK_VIDEO_BYTES.
+    """
+    for key in ("filesize", "filesize_approx"):
+        if entry.get(key):
+            return int(entry[key])
+    if entry.get("duration"):
+        bitrate = BITRATE_BEST if best_format else BITRATE_DEFAULT
+        return int(entry["duration"] * bitrate)
+    return FALLBACK_VIDEO_BYTES
+
+
+def available_bytes(path: Optional[str] = None, reserve: int = DISK_RESERVE_BYTES) -> int:
+    """Return the bytes that can be downloaded under path, YT_DOWNLOADS_PATH by default, keeping reserve bytes free."""
+    if path is None:
+        path = get_downloads_path()
+    os.makedirs(path, exist_ok=True)
+    return max(shutil.disk_usage(path).free - reserve, 0)
+
+
+def priority_key(item: dict) -> tuple:
+    """Sort key of a queue item: highest channel priority, then most recent upload, then playlist order."""
+    upload_date = int(item.get("upload_date") or 0)
+    return (-(item.get("priority") or 0), -upload_date, item.get("playlist_index") or 0)
+
+
+def plan_downloads(
+    items: list[dict],
+    channel_budgets: Optional[dict[str, Optional[int]]] = None,
+    budget: Optional[int] = None,
+    run_budget: Optional[int] = RUN_BYTE_BUDGET,
+) -> tuple[list[dict], list[dict]]:
+    """Split queue items into those to download now and those deferred to a later run.
+
+    Items are taken by priority_key while their estimated size fits both the global budget and the budget of their
+    subscription in channel_budgets. Smaller items further down may still fit once a large one is deferred.
+    Returns a tuple of (selected, deferred) items.
+
+    Args:
+    ----
+        items (list[dict]):
+            Queue items, with estimated_size, priority, upload_date and playlist_index.
+        channel_budgets (dict, optional):
+            Maximum bytes per subscription_url. Defaults to None.
+            Subscriptions missing from the dict, or with a None budget, are only limited by the global budget.
+        budget (int, optional):
+            Global bytes available. Defaults to None.
+            If None, uses available_bytes() capped by run_budget.
+        run_budget (int, optional):
+            Maximum bytes downloaded per run. Defaults to RUN_BYTE_BUDGET from config.
+
+    """
+    if channel_budgets is None:
+        channel_budgets = {}
+    if budget is None:
+        budget = available_bytes()
+        if run_budget is not None:
+            budget = min(budget, run_budget)
+    remaining = dict(channel_budgets)
+    selected = []
+    deferred = []
+    for item in sorted(items, key=priority_key):
+        size = item.get("estimated_size") or FALLBACK_VIDEO_BYTES
+        channel_remaining = remaining.get(item["subscription_url"])
+        if size > budget or (channel_remaining is not None and size > channel_remaining):
+            deferred.append(item)
+            continue
+        budget -= size
+        if channel_remaining is not None:
+            remaining[item["subscription_url"]] = channel_remaining - size
+        selected.append(item)
+    if len(deferred) > 0:
+        deferred_bytes = sum(item.get("estimated_size") or FALLBACK_VIDEO_BYTES for item in deferred)
+        logger.warning(f"Deferring {len(deferred)} download(s), about {deferred_bytes / 1e9:.1f} GB, to a later run")
+    return selected, deferred
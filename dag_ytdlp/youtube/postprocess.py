@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from ..config.ytdl import POSTPROCESS_QUEUE, POSTPROCESS_WORKERS
+from .metrics import REGISTRY, MetricsRegistry
+
+# Stage of the download pipeline reported by the queue depth metrics
+POSTPROCESS_STAGE = "postprocess"
+
+# Process-wide pool, created on first use
+_POOL: Optional[PostprocessPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def split_postprocessors(ydl_opts: dict) -> list[dict]:
+    """Remove the postprocessors run after the download from ydl_opts and return them, for PostprocessPool.
+
+    Postprocessors run at other stages (e.g. before the download) are left for YoutubeDL.
+    """
+    postprocessors = ydl_opts.get("postprocessors") or []
+    pipelined = [pp for pp in postprocessors if pp.get("when", "post_process") == "post_process"]
+    if len(pipelined) > 0:
+        ydl_opts["postprocessors"] = [pp for pp in postprocessors if pp not in pipelined]
+    return pipelined
+
+
+def run_postprocessors(file_path: str, postprocessors: list[dict]) -> tuple[str, float]:
+    """Run yt-dlp postprocessors on a downloaded file, as YoutubeDL would, in a worker process.
+
+    Returns the final path of the file and the seconds spent. Files replaced by a postprocessor (e.g. the original of
+    a converted video) are deleted.
+    """
+    from yt_dlp.postprocessor import get_postprocessor
+
+    start = time.perf_counter()
+    info = {"filepath": file_path, "ext": os.path.splitext(file_path)[1][1:], "__files_to_move": {}}
+    for spec in postprocessors:
+        kwargs = {k: v for k, v in spec.items() if k not in ("key", "when")}
+        files_to_delete, info = get_postprocessor(spec["key"])(None, **kwargs).run(info)
+        for path in files_to_delete:
+            if path != info["filepath"] and os.path.exists(path):
+                os.unlink(path)
+    return info["filepath"], time.perf_counter() - start
+
+
+class PostprocessPool:
+    """Bounded pool of worker processes running yt-dlp postprocessors (remuxing, converting) off the download threads.
+
+    A download hands its file over and frees its download slot, so the next video downloads while this one is
+    converted. Submitting blocks once max_queue files wait for a worker, so conversions never pile up unbounded
+    behind fast downloads. Workers are started with spawn, as the run worker forks while download threads run.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = POSTPROCESS_WORKERS,
+        max_queue: int = POSTPROCESS_QUEUE,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        """Initialize a new pool, starting worker processes on first use.
+
+        Args:
+        ----
+            max_workers (int, optional):
+                Number of worker processes. Defaults to POSTPROCESS_WORKERS from config, the number of cores.
+            max_queue (int, optional):
+                Number of files waiting for a worker before submitting blocks. Defaults to POSTPROCESS_QUEUE.
+            registry (MetricsRegistry, optional):
+                Registry the queue depth is reported to. Defaults to the process-wide REGISTRY.
+
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.registry = registry
+        self._executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of files waiting for a worker."""
+        with self._lock:
+            return max(self._in_flight - self.max_workers, 0)
+
+    def submit(self, file_path: str, postprocessors: list[dict]) -> Future:
+        """Schedule postprocessors on file_path, waiting while the queue is full.
+
+        The future's result is the final path of the file and the seconds spent postprocessing it.
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(run_postprocessors, file_path, postprocessors)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._update_depth(1)
+
+        def release(_):
+            self._update_depth(-1)
+            self._slots.release()
+
+        future.add_done_callback(release)
+        return future
+
+    def shutdown(self):
+        """Wait for submitted files and stop the worker processes."""
+        self._executor.shutdown(wait=True)
+
+    def _update_depth(self, delta: int):
+        """Count a file in or out of the pool and report the queue depth."""
+        with self._lock:
+            self._in_flight += delta
+            depth = max(self._in_flight - self.max_workers, 0)
+        self.registry.set_queue_depth(POSTPROCESS_STAGE, depth)
+
+
+def get_postprocess_pool() -> Optional[PostprocessPool]:
+    """Return the process-wide postprocessing pool, or None if pipelining is disabled (POSTPROCESS_WORKERS = 0)."""
+    global _POOL
+    if POSTPROCESS_WORKERS <= 0:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = PostprocessPool()
+        return _POOL
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+import re
+import socket
+from typing import Iterable, Optional
+
+import sqlalchemy as db
+
+from ..config.ytdl import DOWNLOAD_LEASE_SECONDS, MAX_ATTEMPTS, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS
+from .history import HistoryStore
+from .tables import download_queue
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+FAILED = "failed"
+DONE = "done"
+QUARANTINED = "quarantined"
+
+# Columns identifying a queued video and the channel options needed to download it
+QUEUE_ITEM_KEYS = ("url", "subscription_url", "channel", "parent", "order_seq", "best_format", "playlist_index")
+
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+
+# yt-dlp error messages of videos that will never download, whatever the number of retries
+PERMANENT_ERROR_PATTERN = re.compile(
+    "|".join(
+        [
+            r"video unavailable",
+            r"video (?:has been|was) removed",
+            r"private video",
+            r"members[- ]only",
+            r"join this channel",
+            r"not (?:made this video )?available in your country",
+            r"blocked it in your country",
+            r"geo[- ]?restrict",
+            r"account .* (?:has been )?terminated",
+            r"copyright",
+            r"sign in to confirm your age",
+            r"unsupported url",
+        ]
+    ),
+    re.IGNORECASE,
+)
+
+# yt-dlp error messages of rate limits and throttled sessions, checked first as YouTube words some of them like a
+# permanent error ("Video unavailable. This content isn't available, try again later.")
+RATE_LIMIT_ERROR_PATTERN = re.compile(
+    "|".join(
+        [
+            r"try again later",
+            r"rate[- ]?limit",
+            r"too many requests",
+            r"http error 429",
+            r"confirm you(?:'|’)?re not a bot",
+        ]
+    ),
+    re.IGNORECASE,
+)
+
+# yt-dlp error messages of scheduled premieres and live events ("Premieres in 10 hours", "This live event will
+# begin in 2 days"), retried UPCOMING_MARGIN after they start rather than after the usual backoff
+UPCOMING_ERROR_PATTERN = re.compile(r"(?:premieres?|will begin) in (\d+|an?) (minute|hour|day|week)s?", re.IGNORECASE)
+UPCOMING_UNIT_SECONDS = {"minute": 60, "hour": 3600, "day": 24 * 3600, "week": 7 * 24 * 3600}
+UPCOMING_MARGIN = dt.timedelta(minutes=15)
+
+
+def classify_error(error: Optional[str]) -> str:
+    """Return PERMANENT if error means the video can never be downloaded, TRANSIENT otherwise.
+
+    Rate limits are TRANSIENT, even when worded like a permanent error.
+    """
+    if error is None or RATE_LIMIT_ERROR_PATTERN.search(error):
+        return TRANSIENT
+    if PERMANENT_ERROR_PATTERN.search(error):
+        return PERMANENT
+    return TRANSIENT
+
+
+def upcoming_delay(error: Optional[str]) -> Optional[dt.timedelta]:
+    """Return the time until the premiere or live event of error starts, or None if error is not about one."""
+    match = UPCOMING_ERROR_PATTERN.search(error or "")
+    if match is None:
+        return None
+    count = 1 if match.group(1).lower() in ("a", "an") else int(match.group(1))
+    return dt.timedelta(seconds=count * UPCOMING_UNIT_SECONDS[match.group(2).lower()])
+
+
+def retry_delay(attempts: int) -> dt.timedelta:
+    """Return the exponential backoff before the next attempt of an item that failed attempts times."""
+    seconds = RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return dt.timedelta(seconds=min(seconds, RETRY_MAX_SECONDS))
+
+
+def get_worker_id(run_id: Optional[str] = None) -> str:
+    """Return an identifier for the current process, used to lease queue items."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    if run_id is not None:
+        worker_id = f"{worker_id}:{run_id}"
+    return worker_id[:100]
+
+
+class DownloadQueue:
+    """Durable queue of videos to download, shared by listing and download steps.
+
+    Listing enqueues new videos as pending. Downloaders lease items, moving them to in_progress, and items are
+    marked done in the same transaction that writes them to history (see HistoryStore.record_many) or failed with
+    the last error. Failed items are retried with exponential backoff, and quarantined (never leased again) after a
+    permanent error or MAX_ATTEMPTS attempts. Leases older than lease_seconds are considered abandoned (killed run,
+    container restart) and can be leased again, so a restarted run picks up where the last one stopped.
+    """
+
+    def __init__(self, store: HistoryStore, lease_seconds: int = DOWNLOAD_LEASE_SECONDS):
+        """Initialize a new queue.
+
+        Args:
+        ----
+            store (HistoryStore):
+                Store whose engine holds the queue table.
+            lease_seconds (int, optional):
+                Age in seconds after which an in progress item may be leased again.
+                Defaults to DOWNLOAD_LEASE_SECONDS from config.
+
+        """
+        self.store = store
+        self.engine = store.engine
+        self.table = download_queue
+        self.lease_seconds = lease_seconds
+
+    def enqueue(self, items: list[dict]) -> int:
+        """Add items as pending, returning the number of items added or queued again.
+
+        Items already queued keep their state, except done items which are queued again since they are only
+        enqueued when missing from history.
+        """
+        if len(items) == 0:
+            return 0
+        now = dt.datetime.now()
+        rows = [{**item, "status": PENDING, "attempts": 0, "enqueued_at": now, "updated_at": now} for item in items]
+        insert_stmt = self.store.insert(self.table).values(rows)
+        upsert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=[self.table.c.url],
+            set_={"status": PENDING, "updated_at": now},
+            where=self.table.c.status == DONE,
+        )
+        with self.engine.begin() as conn:
+            return conn.execute(upsert_stmt).rowcount
+
+    def lease(
+        self,
+        worker_id: str,
+        subscription_url: Optional[str] = None,
+        limit: Optional[int] = None,
+        urls: Optional[list[str]] = None,
+    ) -> list[dict]:
+        """Lease items ready for download, optionally only those of subscription_url or in urls.
+
+        Returns the leased rows as dicts, oldest enqueued first.
+        """
+        now = dt.datetime.now()
+        lease_expired = now - dt.timedelta(seconds=self.lease_seconds)
+        query = (
+            db.select(self.table)
+            .where(self._ready(lease_expired))
+            .order_by(self.table.c.enqueued_at, self.table.c.playlist_index)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if subscription_url is not None:
+            query = query.where(self.table.c.subscription_url == subscription_url)
+        if urls is not None:
+            query = query.where(self.table.c.url.in_(urls))
+        with self.engine.begin() as conn:
+            rows = [dict(row) for row in conn.execute(query).mappings()]
+            if len(rows) > 0:
+                urls = [row["url"] for row in rows]
+                conn.execute(
+                    db.update(self.table)
+                    .where(self.table.c.url.in_(urls))
+                    .values(
+                        status=IN_PROGRESS,
+                        leased_by=worker_id,
+                        leased_at=now,
+                        attempts=self.table.c.attempts + 1,
+                        updated_at=now,
+                    )
+                )
+        return rows
+
+    def ready(self, subscription_urls: Optional[list[str]] = None) -> list[dict]:
+        """Return the items ready for download without leasing them, optionally only those of subscription_urls."""
+        lease_expired = dt.datetime.now() - dt.timedelta(seconds=self.lease_seconds)
+        query = (
+            db.select(self.table)
+            .where(self._ready(lease_expired))
+            .order_by(self.table.c.enqueued_at, self.table.c.playlist_index)
+        )
+        if subscription_urls is not None:
+            query = query.where(self.table.c.subscription_url.in_(subscription_urls))
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def pending_subscriptions(self) -> list[dict]:
+        """Return the distinct subscriptions with items ready for download."""
+        lease_expired = dt.datetime.now() - dt.timedelta(seconds=self.lease_seconds)
+        c = self.table.c
+        query = (
+            db.select(c.subscription_url, c.channel, c.parent, c.order_seq, c.best_format)
+            .where(self._ready(lease_expired))
+            .distinct()
+        )
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def ready_by_subscription(self, updated_before: Optional[dt.datetime] = None) -> dict[str, int]:
+        """Return the number of items ready for download by subscription URL.
+
+        If updated_before is given, only items unchanged since then are counted.
+        """
+        lease_expired = dt.datetime.now() - dt.timedelta(seconds=self.lease_seconds)
+        c = self.table.c
+        query = (
+            db.select(c.subscription_url, db.func.count().label("items"))
+            .where(self._ready(lease_expired))
+            .group_by(c.subscription_url)
+        )
+        if updated_before is not None:
+            query = query.where(c.updated_at < updated_before)
+        with self.engine.connect() as conn:
+            return {row["subscription_url"]: row["items"] for row in conn.execute(query).mappings()}
+
+    def fail(self, url: str, error: Optional[str] = None) -> str:
+        """Mark a leased item as failed with its last error, returning its new status.
+
+        The item is quarantined on a permanent error or once it reached MAX_ATTEMPTS, otherwise it becomes ready
+        again after its backoff delay, or shortly after its start for an upcoming premiere or live event.
+        """
+        now = dt.datetime.now()
+        failure_kind = classify_error(error)
+        with self.engine.begin() as conn:
+            attempts = conn.execute(db.select(self.table.c.attempts).where(self.table.c.url == url)).scalar() or 1
+            if failure_kind == PERMANENT or attempts >= MAX_ATTEMPTS:
+                status = QUARANTINED
+                next_attempt_at = None
+            else:
+                status = FAILED
+                upcoming = upcoming_delay(error)
+                next_attempt_at = now + (retry_delay(attempts) if upcoming is None else upcoming + UPCOMING_MARGIN)
+            conn.execute(
+                db.update(self.table)
+                .where(self.table.c.url == url)
+                .values(
+                    status=status,
+                    last_error=error,
+                    failure_kind=failure_kind,
+                    next_attempt_at=next_attempt_at,
+                    leased_by=None,
+                    leased_at=None,
+                    updated_at=now,
+                )
+            )
+        return status
+
+    def quarantined(self, urls: Iterable[str]) -> set[str]:
+        """Return the subset of urls that are quarantined."""
+        urls = list(urls)
+        if len(urls) == 0:
+            return set()
+        query = db.select(self.table.c.url).where(self.table.c.status == QUARANTINED, self.table.c.url.in_(urls))
+        with self.engine.connect() as conn:
+            return {x[0] for x in conn.execute(query)}
+
+    def release(self, worker_id: str, subscription_url: Optional[str] = None):
+        """Return items still leased by worker_id to pending, optionally only those of subscription_url."""
+        now = dt.datetime.now()
+        update_stmt = (
+            db.update(self.table)
+            .where(self.table.c.leased_by == worker_id, self.table.c.status == IN_PROGRESS)
+            .values(status=PENDING, leased_by=None, leased_at=None, updated_at=now)
+        )
+        if subscription_url is not None:
+            update_stmt = update_stmt.where(self.table.c.subscription_url == subscription_url)
+        with self.engine.begin() as conn:
+            conn.execute(update_stmt)
+
+    def _ready(self, lease_expired: dt.datetime):
+        """Return the condition selecting items ready for download."""
+        c = self.table.c
+        return db.or_(
+            c.status == PENDING,
+            db.and_(c.status == FAILED, db.or_(c.next_attempt_at.is_(None), c.next_attempt_at <= dt.datetime.now())),
+            db.and_(c.status == IN_PROGRESS, c.leased_at < lease_expired),
+        )
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ..utils.io import CLEANUP_WORKERS, delete_with_sidecars
+from .history import HistoryStore
+
+logger = logging.getLogger("ytdl_logger")
+
+
+def delete_expired_downloads(
+    store: HistoryStore, channel: str, root: str, ephemeral_days: int, dry_run: bool = False
+) -> int:
+    """Delete the files of channel downloaded more than ephemeral_days ago, as recorded in history.
+
+    Expired files are found with a single indexed query, and resolved against root (where files were synced to),
+    so only the files being deleted are touched. A download is marked deleted once its files are gone from root.
+    Returns the bytes reclaimed, or reclaimable if dry_run is True.
+    """
+    before = dt.datetime.now() - dt.timedelta(days=ephemeral_days)
+    rows = store.expired_files(channel, before)
+    if dry_run:
+        for row in rows:
+            logger.info(f"{row['file_path']} would be deleted from YT library")
+        return sum(row["file_size"] or 0 for row in rows)
+    reclaimed = 0
+    deleted = []
+    for row in rows:
+        file_path = Path(root, row["file_path"])
+        if len(delete_with_sidecars(file_path)) == 0 and file_path.exists():
+            logger.warning(f"{file_path} could not be deleted from YT library")
+            continue
+        reclaimed += row["file_size"] or 0
+        deleted.append((row["video_id"], row["channel"]))
+    store.mark_deleted(deleted)
+    return reclaimed
+
+
+def delete_expired_downloads_concurrently(
+    store: HistoryStore,
+    channels: list[str],
+    root: str,
+    ephemeral_days: int,
+    dry_run: bool = False,
+    max_workers: int = CLEANUP_WORKERS,
+) -> dict[str, int]:
+    """Run delete_expired_downloads for each channel in a bounded thread pool, returning bytes per channel."""
+    with ThreadPoolExecutor(max_workers, thread_name_prefix="ytdl-retention") as executor:
+        futures = {
+            channel: executor.submit(delete_expired_downloads, store, channel, root, ephemeral_days, dry_run)
+            for channel in channels
+        }
+    report = {}
+    for channel, future in futures.items():
+        if future.exception() is not None:
+            logger.warning(f"Retention for {channel} failed: {future.exception()}")
+        else:
+            report[channel] = future.result()
+    return report
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from ..config.ytdl import DOWNLOAD_WORKERS, DOWNLOAD_WORKERS_PER_CHANNEL, DOWNLOAD_WORKERS_PER_HOST, MAX_BANDWIDTH
+from .metrics import REGISTRY
+
+# Stage of the download pipeline reported by the queue depth metrics
+DOWNLOAD_STAGE = "download"
+
+# Process-wide schedulers, keyed by limits
+_SCHEDULERS: dict[tuple, DownloadScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+class DownloadScheduler:
+    """Thread pool running downloads under global, per-channel and per-host concurrency limits.
+
+    A channel or host slot is taken when a download is submitted and released when it completes, so submitting
+    blocks the caller rather than tying up a worker thread while over a limit.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DOWNLOAD_WORKERS,
+        per_channel: int = DOWNLOAD_WORKERS_PER_CHANNEL,
+        per_host: int = DOWNLOAD_WORKERS_PER_HOST,
+        max_bandwidth: Optional[int] = MAX_BANDWIDTH,
+    ):
+        """Initialize a new scheduler.
+
+        Args:
+        ----
+            max_workers (int, optional):
+                Number of downloads running at once across all channels. Defaults to DOWNLOAD_WORKERS from config.
+            per_channel (int, optional):
+                Number of downloads running at once for a single channel. Defaults to DOWNLOAD_WORKERS_PER_CHANNEL.
+            per_host (int, optional):
+                Number of downloads running at once against a single host. Defaults to DOWNLOAD_WORKERS_PER_HOST.
+            max_bandwidth (int, optional):
+                Total bytes per second for all downloads. Defaults to MAX_BANDWIDTH from config.
+                If None, downloads are not rate limited.
+
+        """
+        self.max_workers = max_workers
+        self.per_channel = per_channel
+        self.per_host = per_host
+        self.max_bandwidth = max_bandwidth
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="ytdl-download")
+        self._channel_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_channel))
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of submitted downloads waiting for a worker thread."""
+        with self._lock:
+            return max(self._in_flight - self.max_workers, 0)
+
+    @property
+    def ratelimit(self) -> Optional[int]:
+        """Bytes per second available to a single download, for the yt-dlp ratelimit option."""
+        if self.max_bandwidth is None:
+            return None
+        return max(self.max_bandwidth // self.max_workers, 1)
+
+    def submit(self, channel: str, url: str, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule fn(*args, **kwargs) as a download of url for channel, waiting for a free channel and host slot."""
+        with self._lock:
+            channel_slot = self._channel_slots[channel]
+            host_slot = self._host_slots[urlparse(url).netloc]
+        channel_slot.acquire()
+        host_slot.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            host_slot.release()
+            channel_slot.release()
+            raise
+        self._update_depth(1)
+
+        def release(_):
+            self._update_depth(-1)
+            host_slot.release()
+            channel_slot.release()
+
+        future.add_done_callback(release)
+        return future
+
+    def _update_depth(self, delta: int):
+        """Count a download in or out of the scheduler and report the queue depth."""
+        with self._lock:
+            self._in_flight += delta
+            depth = max(self._in_flight - self.max_workers, 0)
+        REGISTRY.set_queue_depth(DOWNLOAD_STAGE, depth)
+
+
+def get_download_scheduler(
+    max_workers: int = DOWNLOAD_WORKERS,
+    per_channel: int = DOWNLOAD_WORKERS_PER_CHANNEL,
+    per_host: int = DOWNLOAD_WORKERS_PER_HOST,
+    max_bandwidth: Optional[int] = MAX_BANDWIDTH,
+) -> DownloadScheduler:
+    """Return the process-wide scheduler for the given limits, creating it on first use."""
+    key = (max_workers, per_channel, per_host, max_bandwidth)
+    with _SCHEDULERS_LOCK:
+        if key not in _SCHEDULERS:
+            _SCHEDULERS[key] = DownloadScheduler(max_workers, per_channel, per_host, max_bandwidth)
+        return _SCHEDULERS[key]
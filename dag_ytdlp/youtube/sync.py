@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from ..config.ytdl import SYNC_BATCH, SYNC_CHUNK_SIZE, SYNC_WORKERS
+from ..utils.exceptions import SyncVerificationError
+from ..utils.io import media_key
+from .history import HistoryStore
+
+logger = logging.getLogger("ytdl_logger")
+
+
+class SyncResult(NamedTuple):
+    """Files and bytes transferred for one download, with those already on the target skipped."""
+
+    url: str
+    files: int
+    bytes: int
+    skipped: int
+
+
+def file_digest(path: Path, chunk_size: int = SYNC_CHUNK_SIZE) -> str:
+    """Return the SHA-256 hex digest of the file at path, read chunk_size bytes at a time."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_verified(src: Path, dest: Path, chunk_size: int = SYNC_CHUNK_SIZE) -> bool:
+    """Copy src to dest, verifying the copy against the checksum of src. Returns False if dest already matched.
+
+    The copy is written next to dest under a temporary name, read back and checked before it replaces dest, so dest
+    is either absent, the previous file, or a verified copy. Raises SyncVerificationError on a mismatch.
+    """
+    size = os.path.getsize(src)
+    if dest.exists() and os.path.getsize(dest) == size and file_digest(dest) == file_digest(src):
+        return False
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    # unique per copy, so overlapping runs never write to the same temporary file
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.partial")
+    src_hash = hashlib.sha256()
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            while chunk := fsrc.read(chunk_size):
+                src_hash.update(chunk)
+                fdst.write(chunk)
+            fdst.flush()
+            os.fsync(fdst.fileno())
+        if file_digest(tmp) != src_hash.hexdigest():
+            raise SyncVerificationError(f"Checksum mismatch copying {src} to {dest}")
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return True
+
+
+def media_files(file_path: Path) -> list[Path]:
+    """Return file_path and the sidecar files written next to it (.info.json, description, thumbnail, subtitles)."""
+    key = media_key(str(file_path))
+    with os.scandir(file_path.parent) as it:
+        siblings = [Path(entry.path) for entry in it if entry.is_file(follow_symlinks=False)]
+    # partial and temporary files of yt-dlp share the video's prefix but not its media key
+    return [path for path in siblings if media_key(str(path)) == key]
+
+
+def prune_empty_dirs(path: Path, root: Path):
+    """Remove path and its parents while empty, up to but excluding root."""
+    root = root.resolve()
+    path = path.resolve()
+    while path != root and root in path.parents:
+        try:
+            path.rmdir()
+        except OSError:
+            return None
+        path = path.parent
+
+
+def sync_download(
+    store: HistoryStore, row: dict, source_root: str, target_root: str, delete_local: bool = True
+) -> SyncResult:
+    """Transfer the files of a download recorded in history from source_root to target_root.
+
+    The download is marked synced once every file is verified on the target, and only then are the local copies
+    deleted. A download whose local files are gone but whose video is already on the target (e.g. copied by the
+    former rsync timer) is marked synced. One missing from both is marked deleted.
+    """
+    key = (row["video_id"], row["channel"])
+    src = Path(source_root, row["file_path"])
+    dest = Path(target_root, row["file_path"])
+    if not src.exists():
+        if dest.exists():
+            store.mark_synced([key])
+        else:
+            logger.warning(f"{row['file_path']} is missing from both {source_root} and {target_root}")
+            store.mark_deleted([key])
+        return SyncResult(row["url"], 0, 0, 0)
+    files = media_files(src)
+    transferred = 0
+    skipped = 0
+    for path in files:
+        if copy_verified(path, dest.parent / path.name):
+            transferred += path.stat().st_size
+        else:
+            skipped += 1
+    store.mark_synced([key])
+    if delete_local:
+        for path in files:
+            path.unlink(missing_ok=True)
+        prune_empty_dirs(src.parent, Path(source_root))
+    logger.info(f"{row['file_path']} synced to {target_root}")
+    return SyncResult(row["url"], len(files), transferred, skipped)
+
+
+def sync_downloads(
+    store: HistoryStore,
+    source_root: str,
+    target_root: str,
+    delete_local: bool = True,
+    max_workers: int = SYNC_WORKERS,
+    batch_size: int = SYNC_BATCH,
+) -> dict:
+    """Transfer up to batch_size unsynced downloads, oldest first, max_workers at a time.
+
+    Only files recorded in history are transferred, so the downloads tree is never walked and files still being
+    downloaded are never touched. Returns counts of downloads synced and failed, files and bytes transferred.
+    """
+    rows = store.unsynced_files(batch_size)
+    report = {"downloads": 0, "failed": 0, "files": 0, "files_skipped": 0, "bytes": 0}
+    if len(rows) == 0:
+        return report
+    with ThreadPoolExecutor(max_workers, thread_name_prefix="ytdl-sync") as executor:
+        futures = {
+            row["file_path"]: executor.submit(sync_download, store, row, source_root, target_root, delete_local)
+            for row in rows
+        }
+    for file_path, future in futures.items():
+        if future.exception() is not None:
+            logger.warning(f"Syncing {file_path} failed: {future.exception()}")
+            report["failed"] += 1
+            continue
+        result = future.result()
+        report["downloads"] += 1
+        report["files"] += result.files
+        report["files_skipped"] += result.skipped
+        report["bytes"] += result.bytes
+    return report
@@ -0,0 +1,94 @@
+import sqlalchemy as db
+
+SCHEMA = "ytdl"
+
+METADATA = db.MetaData(schema=SCHEMA)
+
+# See proc/dag_ytdlp.sql for the DDL
+downloads = db.Table(
+    "downloads",
+    METADATA,
+    # one row per video and channel, a video linked into a second channel (see youtube/dedup.py) has two
+    db.Column("video_id", db.String(150), primary_key=True),
+    db.Column("channel", db.String(40), primary_key=True),
+    db.Column("url", db.String(150)),
+    db.Column("download_date", db.DateTime(timezone=True)),
+    # relative to YT_DOWNLOADS_PATH, and to YT_NAS_PATH once synced
+    db.Column("file_path", db.Text),
+    db.Column("file_size", db.BigInteger),
+    db.Column("synced_at", db.DateTime(timezone=True)),
+    db.Column("deleted_at", db.DateTime(timezone=True)),
+    db.Index("ix_downloads_channel_download_date", "channel", "download_date"),
+    db.Index(
+        "ix_downloads_unsynced",
+        "download_date",
+        postgresql_where=db.text("synced_at is null and file_path is not null"),
+        sqlite_where=db.text("synced_at is null and file_path is not null"),
+    ),
+)
+
+# Per channel/playlist state learned from previous runs, keyed by subscription URL
+channels = db.Table(
+    "channels",
+    METADATA,
+    db.Column("url", db.String(200), primary_key=True),
+    db.Column("channel", db.String(40)),
+    db.Column("reverse_entries", db.Boolean),
+    db.Column("last_video_id", db.String(150)),
+    db.Column("listing", db.JSON),
+    db.Column("listed_at", db.DateTime(timezone=True)),
+    db.Column("next_listing_at", db.DateTime(timezone=True)),
+    db.Column("last_new_video_at", db.DateTime(timezone=True)),
+    db.Column("posting_interval", db.Float),
+    # RSS feed polled by refresh_yt_channels_sensor, with its cache validators
+    db.Column("feed_url", db.String(200)),
+    db.Column("feed_etag", db.String(200)),
+    db.Column("feed_last_modified", db.String(50)),
+    db.Column("next_feed_check_at", db.DateTime(timezone=True)),
+    db.Column("updated_at", db.DateTime(timezone=True)),
+)
+
+# Videos waiting to be downloaded, see youtube/queue.py for the item lifecycle
+download_queue = db.Table(
+    "download_queue",
+    METADATA,
+    db.Column("url", db.String(150), primary_key=True),
+    db.Column("subscription_url", db.String(200), index=True),
+    db.Column("channel", db.String(40)),
+    db.Column("parent", db.String(40)),
+    db.Column("order_seq", db.Boolean),
+    db.Column("best_format", db.Boolean),
+    db.Column("playlist_index", db.Integer),
+    db.Column("upload_date", db.String(8)),
+    db.Column("estimated_size", db.BigInteger),
+    db.Column("priority", db.Integer),
+    db.Column("status", db.String(12), index=True),
+    db.Column("attempts", db.Integer),
+    db.Column("last_error", db.Text),
+    db.Column("failure_kind", db.String(12)),
+    db.Column("next_attempt_at", db.DateTime(timezone=True)),
+    db.Column("leased_by", db.String(100)),
+    db.Column("leased_at", db.DateTime(timezone=True)),
+    db.Column("enqueued_at", db.DateTime(timezone=True)),
+    db.Column("updated_at", db.DateTime(timezone=True)),
+)
+
+# Metadata of the videos in the library, read from their .info.json sidecars by youtube/library.py
+videos = db.Table(
+    "videos",
+    METADATA,
+    # paths relative to the indexed root (YT_NAS_PATH by default)
+    db.Column("info_path", db.Text, primary_key=True),
+    db.Column("video_id", db.String(64), index=True),
+    db.Column("url", db.String(150)),
+    db.Column("parent", db.String(40)),
+    db.Column("channel", db.String(40), index=True),
+    db.Column("title", db.Text),
+    db.Column("upload_date", db.Date, index=True),
+    db.Column("duration", db.Integer, index=True),
+    db.Column("file_path", db.Text),
+    db.Column("file_size", db.BigInteger, index=True),
+    # latest mtime of the sidecar and its video when indexed, to only parse changed sidecars
+    db.Column("source_mtime", db.Float),
+    db.Column("indexed_at", db.DateTime(timezone=True)),
+)
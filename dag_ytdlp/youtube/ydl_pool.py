@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from yt_dlp import YoutubeDL
+
+from ..config.ytdl import YDL_POOL_SIZE
+
+# Options applying to a single use of a pooled instance, not part of its key
+HOOK_KEYS = ("post_hooks", "progress_hooks", "postprocessor_hooks")
+PER_USE_KEYS = ("logger", "outtmpl", *HOOK_KEYS)
+
+# Process-wide pools, keyed by YoutubeDL class
+_POOLS: dict[type, YdlPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+class YdlHooks:
+    """Logger and hooks a pooled YoutubeDL is built with, forwarding to those of its current borrower.
+
+    Without a borrower logger, messages go where YdlLogger sends them: debug and info printed, warnings and errors to
+    the ytdl logger.
+    """
+
+    def __init__(self):
+        """Initialize hooks with no borrower."""
+        self.fallback_logger = logging.getLogger("ytdl_logger")
+        self.reset()
+
+    def reset(self, logger=None, post_hooks=(), progress_hooks=(), postprocessor_hooks=()):
+        """Forward to the given logger and hooks until the next reset."""
+        self.logger = logger
+        self.post_hooks = list(post_hooks)
+        self.progress_hooks = list(progress_hooks)
+        self.postprocessor_hooks = list(postprocessor_hooks)
+
+    def debug(self, msg: str):
+        """Forward progress messages."""
+        if self.logger is None:
+            print(msg)
+        else:
+            self.logger.debug(msg)
+
+    def info(self, msg: str):
+        """Forward informational messages."""
+        if self.logger is None:
+            print(msg)
+        else:
+            self.logger.info(msg)
+
+    def warning(self, msg: str):
+        """Forward warnings."""
+        (self.logger or self.fallback_logger).warning(msg)
+
+    def error(self, msg: str):
+        """Forward errors."""
+        (self.logger or self.fallback_logger).error(msg)
+
+    def post_hook(self, path: str):
+        """Call the borrower's post hooks with the final path of a video."""
+        for hook in self.post_hooks:
+            hook(path)
+
+    def progress_hook(self, d: dict):
+        """Call the borrower's progress hooks."""
+        for hook in self.progress_hooks:
+            hook(d)
+
+    def postprocessor_hook(self, d: dict):
+        """Call the borrower's postprocessor hooks."""
+        for hook in self.postprocessor_hooks:
+            hook(d)
+
+
+class YdlPool:
+    """Pool of long-lived YoutubeDL instances, keyed by their options.
+
+    Building a YoutubeDL processes its options, sets up postprocessors and cookies, and loads extractors on first
+    use. Pooled instances keep all of this, along with open HTTP connections, between uses. Each borrower gets an
+    instance to itself, with its own output template, logger and hooks (see PER_USE_KEYS) and download counters
+    reset, so nothing leaks from one video to the next.
+    """
+
+    def __init__(self, ydl_class: type = YoutubeDL, max_idle: int = YDL_POOL_SIZE):
+        """Initialize an empty pool.
+
+        Args:
+        ----
+            ydl_class (type, optional):
+                YoutubeDL compatible class of the pooled instances. Defaults to YoutubeDL.
+            max_idle (int, optional):
+                Number of idle instances kept per set of options, others are closed when returned.
+                Defaults to YDL_POOL_SIZE from config.
+
+        """
+        self.ydl_class = ydl_class
+        self.max_idle = max_idle
+        self._idle: dict[str, list[tuple]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self, ydl_opts: dict) -> Iterator:
+        """Lend an instance built with ydl_opts, returning it to the pool on exit."""
+        opts = {k: v for k, v in ydl_opts.items() if k not in PER_USE_KEYS}
+        key = json.dumps(opts, sort_keys=True, default=repr)
+        with self._lock:
+            idle = self._idle[key].pop() if len(self._idle[key]) > 0 else None
+        if idle is None:
+            hooks = YdlHooks()
+            params = {
+                **opts,
+                "logger": hooks,
+                "post_hooks": [hooks.post_hook],
+                "progress_hooks": [hooks.progress_hook],
+                "postprocessor_hooks": [hooks.postprocessor_hook],
+            }
+            if "outtmpl" in ydl_opts:
+                params["outtmpl"] = copy.deepcopy(ydl_opts["outtmpl"])
+            ydl = self.ydl_class(params)
+            outtmpl = ydl.params.get("outtmpl")
+            idle = (ydl, hooks, outtmpl if isinstance(outtmpl, dict) else None)
+        ydl, hooks, base_outtmpl = idle
+        self._prepare(ydl, base_outtmpl, ydl_opts.get("outtmpl"))
+        hooks.reset(ydl_opts.get("logger"), *(ydl_opts.get(k, ()) for k in HOOK_KEYS))
+        try:
+            yield ydl
+        finally:
+            hooks.reset()
+            with self._lock:
+                if len(self._idle[key]) < self.max_idle:
+                    self._idle[key].append(idle)
+                    ydl = None
+            if ydl is not None and hasattr(ydl, "close"):
+                ydl.close()
+
+    def close(self):
+        """Close every idle instance."""
+        with self._lock:
+            idle, self._idle = self._idle, defaultdict(list)
+        for instances in idle.values():
+            for ydl, _, _ in instances:
+                if hasattr(ydl, "close"):
+                    ydl.close()
+
+    @staticmethod
+    def _prepare(ydl, base_outtmpl: Optional[dict], outtmpl):
+        """Set the output template of this use and reset the counters YoutubeDL keeps across downloads."""
+        if base_outtmpl is not None and outtmpl is not None:
+            # YoutubeDL expects the dict form it builds from a string template in __init__
+            default = outtmpl if isinstance(outtmpl, str) else outtmpl["default"]
+            ydl.params["outtmpl"] = {**base_outtmpl, "default": default}
+        # sticky once a download failed, and counted against max_downloads
+        for attr in ("_download_retcode", "_num_downloads"):
+            if hasattr(ydl, attr):
+                setattr(ydl, attr, 0)
+
+
+def get_ydl_pool(ydl_class: type = YoutubeDL) -> YdlPool:
+    """Return the process-wide pool of ydl_class instances, creating it on first use."""
+    with _POOLS_LOCK:
+        if ydl_class not in _POOLS:
+            _POOLS[ydl_class] = YdlPool(ydl_class)
+        return _POOLS[ydl_class]
+
+
+@atexit.register
+def _close_pools():
+    """Save cookies and close connections of pooled instances at exit."""
+    for pool in list(_POOLS.values()):
+        pool.close()
@@ -2,14 +2,29 @@ from __future__ import annotations
 
 import datetime as dt
 import logging
+import os
 import re
+import time
+from concurrent.futures import wait
 from typing import Iterable, TypeVar
 
-import sqlalchemy as db
 from yt_dlp import YoutubeDL
 
-from ..config.database import DATABASE_URL
-from ..config.ytdl import YDL_OPTS_BEST, YDL_OPTS_DEFAULT
+from ..config.ytdl import (
+    INCREMENTAL_PAGE_SIZE,
+    INCREMENTAL_STOP_AFTER,
+    get_downloads_path,
+)
+from .dedup import link_existing_downloads
+from .history import HistoryStore, canonical_video_url, get_history_store, get_video_id
+from .listing import listing_ttl, to_aware, update_posting_interval
+from .metrics import DB_WRITE, DOWNLOAD, HISTORY_QUERY, LISTING, POSTPROCESS, UPLOAD_DATE_PROBE, ChannelMetrics
+from .options import ChannelOptions
+from .planning import estimate_size, plan_downloads
+from .postprocess import POSTPROCESS_STAGE, get_postprocess_pool, split_postprocessors
+from .queue import QUARANTINED, DownloadQueue, get_worker_id
+from .scheduler import DOWNLOAD_STAGE, DownloadScheduler, get_download_scheduler
+from .ydl_pool import get_ydl_pool
 
 T = TypeVar("T")
 
@@ -25,16 +40,70 @@ def take(amount: int, iterable: Iterable[T], reverse: bool = False) -> Iterable[
         yield elem
 
 
+def batched(iterable: Iterable[T], size: int) -> Iterable[list[T]]:
+    """Lazily split iterable into lists of at most size items."""
+    batch = []
+    for elem in iterable:
+        batch.append(elem)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
 def check_url_is_playlist(url: str):
     """True if string follows YouTube's playlist syntax."""
     return bool(re.search(r"\/playlist\?", url))
 
 
+class YdlLogger:
+    """Logger for YoutubeDL keeping its regular output while recording errors of a download."""
+
+    def __init__(self):
+        """Initialize a new logger with no recorded errors."""
+        self.logger = logging.getLogger("ytdl_logger")
+        self.errors = []
+
+    def debug(self, msg: str):
+        """Print progress messages, as YoutubeDL does without a logger."""
+        print(msg)
+
+    def info(self, msg: str):
+        """Print informational messages."""
+        print(msg)
+
+    def warning(self, msg: str):
+        """Forward warnings to the ytdl logger."""
+        self.logger.warning(msg)
+
+    def error(self, msg: str):
+        """Record and forward errors to the ytdl logger."""
+        self.errors.append(msg)
+        self.logger.error(msg)
+
+
 class YT_Channel:
     """Core class for managing downloading of videos from a specified channel or playlist."""
 
+    # YoutubeDL compatible class used for listing and downloading, replaced by a local fake in benchmarks
+    ydl_class = YoutubeDL
+
     def __init__(
-        self, url: str, channel: str = None, parent: str = None, order_seq: bool = False, best_format: bool = False
+        self,
+        url: str,
+        channel: str = None,
+        parent: str = None,
+        order_seq: bool = False,
+        best_format: bool = False,
+        history: HistoryStore = None,
+        run_id: str = None,
+        incremental: bool = False,
+        scheduler: DownloadScheduler = None,
+        cache_listing: bool = False,
+        priority: int = 0,
+        max_bytes: int = None,
+        link_existing: str = None,
     ):
         """Initialize a new instance of the class.
 
@@ -55,66 +124,116 @@ class YT_Channel:
             best_format (bool, optional):
                 Flag to indicate if the best format should be used. Defaults to False.
                 When True, will override the ydl_opts format. This can eat up a lot more space.
+            history (HistoryStore, optional):
+                Store used to skip and record downloaded videos. Defaults to None.
+                If None, the process-wide store from config is used.
+            run_id (str, optional):
+                Identifier of the current run. Defaults to None.
+                If provided, history lookups are answered from a snapshot shared by all channels of the run.
+            incremental (bool, optional):
+                Flag to indicate if listing should stop at previously downloaded videos. Defaults to False.
+                If True and the listing is known to be newest first, entries are streamed and paging stops at the
+                channel's high-water mark or after INCREMENTAL_STOP_AFTER consecutive downloaded videos.
+            scheduler (DownloadScheduler, optional):
+                Scheduler running the downloads concurrently. Defaults to None.
+                If None, the process-wide scheduler from config is used.
+            cache_listing (bool, optional):
+                Flag to indicate if listings should be cached. Defaults to False.
+                If True, the channel is only listed again once its cached listing expires, after a TTL learned from
+                how often the channel posts new videos.
+            priority (int, optional):
+                Download priority of the channel when disk space is short. Defaults to 0, higher goes first.
+            max_bytes (int, optional):
+                Maximum estimated bytes downloaded for the channel per run. Defaults to None, unlimited.
+                Videos over budget are kept in the queue for a later run.
+            link_existing (str, optional):
+                How to add videos already downloaded by another channel. Defaults to None, skipping them.
+                If "hardlink" or "symlink", the other channel's files are linked into this channel's folder.
 
         """
-        # There is a bug with ytdl where the original copy of ytdl_opts gets overwritten when intializing a new instance
-        # Hence for some wonky work-arounds
         self.url = url
         self.channel = channel
         self.parent = parent
         self.order_seq = order_seq
-        self.ydl_opts = YDL_OPTS_DEFAULT
-        if best_format:
-            self.ydl_opts = YDL_OPTS_BEST
-        self.outtmpl_default_bug = False
-        if isinstance(
-            self.ydl_opts["outtmpl"], str
-        ):  # weird bug? where sometimes the outtmpl is a dict with item = "default"
-            outtmpl = self.ydl_opts["outtmpl"]
-        else:
-            outtmpl = self.ydl_opts["outtmpl"]["default"]
-            self.outtmpl_default_bug = True
-        if parent is not None:
-            outtmpl = outtmpl.replace("%(channel)s", f"{parent}/%(channel)s")
-        if channel is not None:
-            outtmpl = outtmpl.replace("%(channel)s", f"{channel}")
-        if self.order_seq:
-            outtmpl = outtmpl.replace("Season %(upload_date>%y)s", "Season 1")
-            outtmpl = outtmpl.replace("S%(upload_date>%y)s", "S1")
-        if self.outtmpl_default_bug:
-            self.ydl_opts["outtmpl"]["default"] = outtmpl
-        else:
-            self.ydl_opts["outtmpl"] = outtmpl
-        self.outtmpl = outtmpl
+        self.best_format = best_format
+        if history is None:
+            history = get_history_store()
+        self.history = history
+        self.history_writer = None
+        self.run_id = run_id
+        self.queue = DownloadQueue(history)
+        self.worker_id = get_worker_id(run_id)
+        self.download_errors = {}
+        # downloads handed to the postprocessing pool: url -> (future, channel, bytes, download seconds, update_db)
+        self.postprocessing = {}
+        # False while a single video is downloaded: there is no next download to overlap its conversion with
+        self.pipeline_postprocessing = True
+        self.incremental = incremental
+        if scheduler is None:
+            scheduler = get_download_scheduler()
+        self.scheduler = scheduler
+        self.cache_listing = cache_listing
+        self.listing_cached = False
+        # True if the last listing could not be extracted, it is then not cached
+        self.listing_failed = False
+        self.priority = priority
+        self.max_bytes = max_bytes
+        self.link_existing = link_existing
+        self.video_metadata = []
+        self.known_urls = None
+        self.listed_entries = 0
+        self.metrics = ChannelMetrics(channel)
+        self.ydl_pool = get_ydl_pool(self.ydl_class)
+        self.options = ChannelOptions.build(channel, parent, order_seq, best_format)
         self.logging = logging.getLogger("ytdl_logger")
 
     def fetch_entries(self):
-        """Populate URLs of videos for the channel."""
+        """Populate URLs of videos for the channel, timed as the listing phase."""
+        with self.metrics.phase(LISTING, exclude=(HISTORY_QUERY, UPLOAD_DATE_PROBE, DB_WRITE)):
+            self.listing_cached = False
+            self.listing_failed = False
+            if self.cache_listing and self.load_cached_listing():
+                return None
+            # entries are fetched lazily, so the instance is held until the listing is consumed
+            with self.ydl_pool.borrow(self.options.for_listing()) as ydl:
+                self._fetch_entries(ydl)
+
+    def _fetch_entries(self, ydl):
+        """Populate URLs of videos for the channel, listed with ydl."""
         if self.order_seq:
             # Arbitrary high number
             max_hist = 1000
         else:
-            max_hist = self.ydl_opts["playlistend"]
-        with YoutubeDL(self.ydl_opts) as ydl:
-            yt_info = ydl.extract_info(self.url, download=False, process=False)
+            max_hist = self.options.playlistend
+        yt_info = ydl.extract_info(self.url, download=False, process=False)
         if yt_info is None:
             self.logging.warning(f"{self.channel} returned empty. Check {self.url}.")
+            self.listing_failed = True
             self.video_urls = []
             return None
         result = []
-        entries = yt_info.get("entries", [])
-        # convert generator to list and remove private videos
-        entries = [entry for entry in list(entries) if not self._remove_video(entry)]
-        if entries is None or len(entries) == 0:
-            self.logging.warning(f"{self.channel} returned no valid video URLs. Check {self.url}.")
-            return None
-        first_date = self.get_video_upload_date(entries[0].get("url"))
-        last_date = self.get_video_upload_date(entries[-1].get("url"))
+        # the same video may be listed as a watch, shorts or youtu.be URL, history and the queue use the watch URL
+        entries = (self._canonical_entry(entry) for entry in self._count_listed(yt_info.get("entries") or []))
         playlist_count = yt_info.get("playlist_count", None)
         if playlist_count is not None:
             max_hist = min(max_hist, playlist_count)
-        # For some (but not all) playlists, the oldest video is the first url
-        reverse_entries = (last_date > first_date) and not (self.order_seq)
+        self.known_urls = None
+        if self.incremental and self.listing_newest_first():
+            entries = self.take_new_entries(entries, max_hist)
+            reverse_entries = False
+        else:
+            # convert generator to list and remove private videos
+            entries = [entry for entry in list(entries) if not self._remove_video(entry)]
+            # For some (but not all) playlists, the oldest video is the first url
+            reverse_entries = len(entries) > 0 and not self.order_seq and self.entries_oldest_first(entries)
+        if len(entries) == 0:
+            # an incremental listing stopping at the high-water mark right away is the usual steady state
+            if self.listed_entries == 0:
+                self.logging.warning(f"{self.channel} returned no video URLs. Check {self.url}.")
+            else:
+                self.logging.info(f"{self.channel}: no new videos")
+            self.video_urls = []
+            return None
         for i, entry in enumerate(take(max_hist, iter(entries), reverse_entries)):
             if entry.get("url") is None:
                 logging.warning("Ignoring malformed url entry from %s", entry.get("url"))
@@ -124,42 +243,140 @@ class YT_Channel:
         self.video_metadata = result
         self.video_urls = [(result[i]["url"], result[i]["playlist_index"]) for i in range(len(result))]
 
+    def _count_listed(self, entries: Iterable[dict]) -> Iterable[dict]:
+        """Yield entries as listed, counting them in self.listed_entries."""
+        self.listed_entries = 0
+        for entry in entries:
+            self.listed_entries += 1
+            yield entry
+
+    def load_cached_listing(self) -> bool:
+        """Populate URLs of videos from the cached listing if still fresh, returning True if it was."""
+        state = self.history.get_channel_state(self.url)
+        if state is None or state["listing"] is None or state["next_listing_at"] is None:
+            return False
+        next_listing_at = to_aware(state["next_listing_at"])
+        if next_listing_at <= dt.datetime.now().astimezone():
+            return False
+        self.video_urls = [(url, idx) for (url, idx) in state["listing"]]
+        self.known_urls = None
+        self.listing_cached = True
+        self.logging.info(f"Using cached listing for {self.channel} until {next_listing_at:%Y-%m-%d %H:%M}")
+        return True
+
+    def update_listing_cache(self, new_videos: int):
+        """Cache the current listing, with a TTL updated from whether it found new_videos."""
+        now = dt.datetime.now().astimezone()
+        state = self.history.get_channel_state(self.url) or {}
+        posting_interval = state.get("posting_interval")
+        last_new_video_at = to_aware(state.get("last_new_video_at"))
+        if new_videos > 0:
+            posting_interval = update_posting_interval(posting_interval, last_new_video_at, now)
+            last_new_video_at = now
+        ttl = listing_ttl(posting_interval, last_new_video_at, now)
+        with self.metrics.phase(DB_WRITE):
+            self.history.set_channel_state(
+                self.url,
+                channel=self.channel,
+                listing=[[url, idx] for (url, idx) in self.video_urls],
+                listed_at=now,
+                next_listing_at=now + ttl,
+                last_new_video_at=last_new_video_at,
+                posting_interval=posting_interval,
+            )
+
+    def listing_newest_first(self) -> bool:
+        """Return True if the listing is known to be newest first before it is fetched."""
+        if not check_url_is_playlist(self.url):
+            return True
+        state = self.history.get_channel_state(self.url)
+        return state is not None and state["reverse_entries"] is False
+
+    def take_new_entries(self, entries: Iterable[dict], max_hist: int) -> list[dict]:
+        """Stream a newest first listing until reaching previously downloaded videos.
+
+        Entries are checked against history one page at a time. Paging stops at the channel's high-water mark, after
+        INCREMENTAL_STOP_AFTER consecutive downloaded videos, or after max_hist entries. Previously downloaded
+        entries are kept (their position sets the playlist index) and their URLs are stored in self.known_urls.
+        """
+        state = self.history.get_channel_state(self.url)
+        last_video_id = None if state is None else state["last_video_id"]
+        self.known_urls = set()
+        result = []
+        consecutive_known = 0
+        entries = (entry for entry in entries if not self._remove_video(entry) and entry.get("url") is not None)
+        for page in batched(take(max_hist, entries), INCREMENTAL_PAGE_SIZE):
+            known = self.get_hist_dl_urls([entry["url"] for entry in page])
+            self.known_urls.update(known)
+            for entry in page:
+                if get_video_id(entry["url"]) == last_video_id:
+                    return result
+                result.append(entry)
+                consecutive_known = consecutive_known + 1 if entry["url"] in known else 0
+                if consecutive_known >= INCREMENTAL_STOP_AFTER:
+                    return result
+        return result
+
+    def update_high_water_mark(self, downloaded_urls: set[str]):
+        """Persist the newest video below which every listed video is in history."""
+        last_video_id = None
+        for url, _ in reversed(self.video_urls):
+            if url not in downloaded_urls:
+                break
+            last_video_id = get_video_id(url)
+        if last_video_id is not None:
+            with self.metrics.phase(DB_WRITE):
+                self.history.set_channel_state(self.url, channel=self.channel, last_video_id=last_video_id)
+
+    def entries_oldest_first(self, entries: list[dict]) -> bool:
+        """Return True if the listing is ordered from oldest to newest video.
+
+        Decided without extra requests whenever possible, in order:
+            - Dates present in the flat listing for both the first and last entry
+            - Channel tabs, which YouTube always lists newest first
+            - Ordering learned for this playlist on a previous run
+        Otherwise the first and last upload dates are probed once and the result is persisted for future runs.
+        """
+        first, last = entries[0], entries[-1]
+        for key in ("timestamp", "release_timestamp", "upload_date"):
+            if first.get(key) is not None and last.get(key) is not None:
+                return last[key] > first[key]
+        if not check_url_is_playlist(self.url):
+            return False
+        state = self.history.get_channel_state(self.url)
+        if state is not None and state["reverse_entries"] is not None:
+            return state["reverse_entries"]
+        first_date = self.get_video_upload_date(first.get("url"))
+        last_date = self.get_video_upload_date(last.get("url"))
+        reverse_entries = last_date > first_date
+        self.history.set_channel_state(self.url, channel=self.channel, reverse_entries=reverse_entries)
+        return reverse_entries
+
     def get_video_upload_date(self, url: str) -> int:
-        dt = YoutubeDL(self.ydl_opts).extract_info(url, download=False, process=False)["upload_date"]
+        with self.metrics.phase(UPLOAD_DATE_PROBE):
+            with self.ydl_pool.borrow(self.options.for_listing()) as ydl:
+                dt = ydl.extract_info(url, download=False, process=False)["upload_date"]
         return dt
 
-    @staticmethod
-    def get_hist_dl_urls() -> list[str]:
-        """Query DB and return list of URLs previously downloaded."""
-        engine = db.create_engine(DATABASE_URL)
-        connection = engine.connect()
-        table = db.Table("downloads", db.MetaData(), autoload_with=engine, schema="ytdl")
-        query = db.select(table.columns.url)
-        rslt = connection.execute(query).fetchall()
-        url_hist = [x[0] for x in rslt]
-        return url_hist
+    def get_hist_dl_urls(self, urls: list[str]) -> set[str]:
+        """Return the subset of urls previously downloaded."""
+        with self.metrics.phase(HISTORY_QUERY):
+            return self.history.downloaded(urls, self.run_id)
 
-    @staticmethod
-    def update_db_with_video_url(url: str, channel: str):
-        """Update history with video URL and channel."""
-        now = dt.datetime.now()
-        engine = db.create_engine(DATABASE_URL)
-        table = db.Table("downloads", db.MetaData(), autoload_with=engine, schema="ytdl")
-        insert_stmt = db.insert(table).values(url=url, channel=channel, download_date=now)
-        with engine.connect() as conn:
-            conn.execute(insert_stmt)
-            conn.commit()
-
-    def use_index_for_episode(self, ydl_opts: dict, idx: int) -> dict:
-        """Update format for epsides in YT config dict to use playlist index."""
-        outtmpl = self.outtmpl
-        outtmpl = outtmpl.replace("E%(upload_date>%m%d)s", f"E{idx}")
-        # hack due to bug (see class initialization)
-        if isinstance(self.ydl_opts["outtmpl"], str):
-            ydl_opts["outtmpl"] = outtmpl
+    def update_db_with_video_url(self, url: str, channel: str, file_path: str = None):
+        """Update history with video URL, channel and downloaded file.
+
+        Buffered while download_new_videos is running, written immediately otherwise.
+        """
+        file_size = None
+        if file_path is not None:
+            file_size = os.path.getsize(file_path) if os.path.exists(file_path) else None
+            file_path = os.path.relpath(file_path, get_downloads_path())
+        if self.history_writer is None:
+            with self.metrics.phase(DB_WRITE):
+                self.history.record(url, channel, file_path, file_size)
         else:
-            ydl_opts["outtmpl"]["default"] = outtmpl
-        return ydl_opts
+            self.history_writer.add(url, channel, file_path, file_size)
 
     def download_video(self, url: str, playlist_idx: int, update_db=True):
         """Download a single video.
@@ -170,48 +387,218 @@ class YT_Channel:
         playlist_idx (int): Index of playlist. Only used if self.order_seq = True.
         update_db (bool): Add entry to database after successful download. Defaults to True
 
+        Postprocessors run after the download are handed to the postprocessing pool, so the download slot is freed
+        for the next video. Those videos are recorded once converted, by wait_postprocessing. Unless
+        pipeline_postprocessing is False, when they run inline in yt-dlp.
+
         """
-        ydl_opts = self.ydl_opts.copy()
+        # a new dict per video, downloads run concurrently and YoutubeDL rewrites outtmpl in place
+        ydl_opts = self.options.for_video(playlist_idx if self.order_seq else None)
+        if self.scheduler.ratelimit is not None:
+            ydl_opts["ratelimit"] = self.scheduler.ratelimit
         if self.channel is None:
             channel = ""
         else:
             channel = self.channel
-        if self.order_seq:
-            ydl_opts = self.use_index_for_episode(ydl_opts, playlist_idx)
+        ydl_logger = YdlLogger()
+        ydl_opts["logger"] = ydl_logger
+        # final path of the video, after postprocessing
+        file_paths = []
+        ydl_opts["post_hooks"] = [file_paths.append]
+        # bytes of every downloaded format, and time spent in postprocessors (merging, converting)
+        downloaded_bytes = []
+        postprocess = {"seconds": 0.0, "started": {}}
+
+        def progress_hook(d: dict):
+            if d.get("status") == "finished":
+                downloaded_bytes.append(d.get("downloaded_bytes") or d.get("total_bytes") or 0)
 
-        with YoutubeDL(ydl_opts) as ydl:
+        def postprocessor_hook(d: dict):
+            if d.get("status") == "started":
+                postprocess["started"][d.get("postprocessor")] = time.perf_counter()
+            elif d.get("status") == "finished" and d.get("postprocessor") in postprocess["started"]:
+                postprocess["seconds"] += time.perf_counter() - postprocess["started"].pop(d.get("postprocessor"))
+
+        ydl_opts["progress_hooks"] = [progress_hook]
+        ydl_opts["postprocessor_hooks"] = [postprocessor_hook]
+        # converted by the postprocessing pool once downloaded, while this thread moves on to the next video
+        postprocess_pool = None
+        if ydl_opts.get("postprocessors") and self.pipeline_postprocessing:
+            postprocess_pool = get_postprocess_pool()
+        pipelined = split_postprocessors(ydl_opts) if postprocess_pool is not None else []
+
+        start = time.perf_counter()
+        with self.ydl_pool.borrow(ydl_opts) as ydl:
             dl_fail = ydl.download([url])
+        download_seconds = time.perf_counter() - start - postprocess["seconds"]
+        self.metrics.add(DOWNLOAD, download_seconds)
+        self.metrics.add(POSTPROCESS, postprocess["seconds"])
+        if not dl_fail:
+            size = sum(downloaded_bytes)
+            if size == 0 and len(file_paths) > 0 and os.path.exists(file_paths[-1]):
+                size = os.path.getsize(file_paths[-1])
+            if len(pipelined) > 0 and len(file_paths) > 0:
+                future = postprocess_pool.submit(file_paths[-1], pipelined)
+                self.metrics.observe_queue_depth(POSTPROCESS_STAGE, postprocess_pool.queue_depth)
+                self.postprocessing[url] = (future, channel, size, download_seconds, update_db)
+                return True
+            self.metrics.record_video(url, size, download_seconds, postprocess["seconds"])
+        if len(ydl_logger.errors) > 0:
+            self.download_errors[url] = ydl_logger.errors[-1]
         if update_db and not dl_fail:
-            self.update_db_with_video_url(url, channel)
+            self.update_db_with_video_url(url, channel, file_paths[-1] if len(file_paths) > 0 else None)
             logging.info(f"{url} for channel {channel} successfully downloaded")
         elif dl_fail:
             logging.warning(f"{url} for channel {channel} download failed")
         else:
             logging.info(f"{url} for channel {channel} successfully downloaded")
+        return not dl_fail
+
+    def wait_postprocessing(self) -> set[str]:
+        """Wait for the downloads handed to the postprocessing pool, returning the URLs whose postprocessing failed.
+
+        Successfully postprocessed videos are recorded in history with their final path, if download_video was called
+        with update_db.
+        """
+        failed = set()
+        postprocessing, self.postprocessing = self.postprocessing, {}
+        for url, (future, channel, size, download_seconds, update_db) in postprocessing.items():
+            try:
+                file_path, postprocess_seconds = future.result()
+            except Exception as e:
+                logging.warning(f"{url} for channel {channel} postprocessing failed: {e}")
+                self.download_errors[url] = f"Postprocessing failed: {e}"
+                failed.add(url)
+                continue
+            self.metrics.add(POSTPROCESS, postprocess_seconds)
+            self.metrics.record_video(url, size, download_seconds, postprocess_seconds)
+            if update_db:
+                self.update_db_with_video_url(url, channel, file_path)
+            logging.info(f"{url} for channel {channel} successfully downloaded")
+        return failed
 
     def download_new_videos(self):
         """Initiate downloading of videos for channel.
 
-        Will only download videos if not present in history.
+        Will only download videos if not present in history. New videos are added to the download queue, then every
+        queued video of the channel is downloaded, including those left over by previous runs.
         """
-        url_hist = self.get_hist_dl_urls()
-        video_urls = [(url, idx) for (url, idx) in self.video_urls if url not in url_hist]
+        handled_urls = self.enqueue_new_videos()
+        downloaded_urls = handled_urls | self.download_queued()
+        if self.incremental:
+            self.update_high_water_mark(downloaded_urls)
 
-        if len(video_urls) > 0:
-            for url, idx in video_urls:
-                self.download_video(url, idx)
-            logging.info(f"Completed attempted downloads for {self.channel}")
+    def enqueue_new_videos(self) -> set[str]:
+        """Add listed videos missing from history to the download queue.
+
+        Returns the listed URLs that need no download, either in history or quarantined. With link_existing, videos
+        downloaded by other channels are linked first. Those not linked yet are neither queued, as the other channel's
+        download is waiting to be synced, nor handled, so they are linked by a later run.
+        """
+        if self.known_urls is None:
+            url_hist = self.get_hist_dl_urls([url for (url, _) in self.video_urls])
         else:
+            url_hist = self.known_urls
+        waiting = set()
+        if self.link_existing is not None and len(url_hist) > 0:
+            with self.metrics.phase(DB_WRITE):
+                waiting = self.link_existing_videos(set(url_hist))
+        video_urls = [(url, idx) for (url, idx) in self.video_urls if url not in url_hist]
+        with self.metrics.phase(HISTORY_QUERY):
+            quarantined = self.queue.quarantined([url for (url, _) in video_urls])
+        if len(quarantined) > 0:
+            logging.info(f"Skipping {len(quarantined)} quarantined video(s) for {self.channel}")
+        video_urls = [(url, idx) for (url, idx) in video_urls if url not in quarantined]
+        with self.metrics.phase(DB_WRITE):
+            added = self.queue.enqueue([self.queue_item(url, idx) for (url, idx) in video_urls])
+        if self.cache_listing and not self.listing_cached and not self.listing_failed:
+            self.update_listing_cache(added)
+        # quarantined videos will not be retried, so they do not hold back the high-water mark
+        return (set(url_hist) - waiting) | quarantined
+
+    def link_existing_videos(self, url_hist: set[str]) -> set[str]:
+        """Link the videos of url_hist downloaded by other channels, returning those to link later."""
+        return link_existing_downloads(self.history, url_hist, self.channel, self.parent, self.link_existing)
+
+    def queue_item(self, url: str, playlist_idx: int) -> dict:
+        """Return the download queue row for a video of this channel."""
+        entry = next((x for x in self.video_metadata if x["url"] == url), {})
+        return {
+            "url": url,
+            "subscription_url": self.url,
+            "channel": self.channel,
+            "parent": self.parent,
+            "order_seq": self.order_seq,
+            "best_format": self.best_format,
+            "playlist_index": playlist_idx,
+            "upload_date": entry.get("upload_date"),
+            "estimated_size": estimate_size(entry, self.best_format),
+            "priority": self.priority,
+        }
+
+    def download_queued(self, urls: list[str] = None) -> set[str]:
+        """Lease and download the queued videos of this channel, returning the URLs successfully downloaded.
+
+        If urls is provided, only those queued videos are downloaded. Otherwise the queued videos are planned against
+        the free disk space and the channel's max_bytes, and those over budget are left for a later run. A single
+        video, e.g. a step of refresh_yt_subscriptions, is postprocessed inline rather than in the pool, as nothing
+        would overlap with it and the step would pay for starting the worker processes.
+        """
+        if urls is None:
+            selected, _ = plan_downloads(self.queue.ready([self.url]), {self.url: self.max_bytes})
+            urls = [item["url"] for item in selected]
+        items = self.queue.lease(self.worker_id, self.url, urls=urls)
+        if len(items) == 0:
             logging.info(f"No new videos to download for {self.channel}")
+            return set()
+        futures = {}
+        downloaded_urls = set()
+        postprocess_failed = set()
+        self.pipeline_postprocessing = len(items) > 1
+        try:
+            with self.history.writer(metrics=self.metrics) as self.history_writer:
+                try:
+                    for item in items:
+                        url = item["url"]
+                        idx = item["playlist_index"]
+                        futures[self.scheduler.submit(self.channel, url, self.download_video, url, idx)] = url
+                        self.metrics.observe_queue_depth(DOWNLOAD_STAGE, self.scheduler.queue_depth)
+                finally:
+                    wait(futures)
+                    postprocess_failed = self.wait_postprocessing()
+                    self.history_writer = None
+            for future, url in futures.items():
+                if future.exception() is not None:
+                    logging.warning(f"{url} for channel {self.channel} download failed: {future.exception()}")
+                    status = self.queue.fail(url, str(future.exception()))
+                elif future.result() and url not in postprocess_failed:
+                    downloaded_urls.add(url)
+                    continue
+                else:
+                    status = self.queue.fail(url, self.download_errors.get(url))
+                if status == QUARANTINED:
+                    logging.warning(f"{url} for channel {self.channel} quarantined: {self.download_errors.get(url)}")
+        finally:
+            # items never submitted, e.g. interrupted while waiting for a slot
+            self.queue.release(self.worker_id, self.url)
+        logging.info(f"Completed attempted downloads for {self.channel}")
+        return downloaded_urls
 
     def download_from_url(self):
         """Download a single video given a provided URL if not in database."""
-        self.video_urls = [(self.url, 0)]
+        self.video_urls = [(canonical_video_url(self.url), 0)]
         self.download_new_videos()
 
     def set_max_videos(self, max_videos: int = 100):
         """Override default options for max videos to add download queue."""
-        self.ydl_opts["playlistend"] = max_videos
+        self.options = self.options.with_playlistend(max_videos)
+
+    @staticmethod
+    def _canonical_entry(entry: dict) -> dict:
+        """Return entry with its URL in canonical form."""
+        if entry.get("url") is not None:
+            entry["url"] = canonical_video_url(entry["url"])
+        return entry
 
     @staticmethod
     def _remove_video(entry):
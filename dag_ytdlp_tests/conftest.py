@@ -0,0 +1,12 @@
+import pytest
+
+from dag_ytdlp.youtube.history import HistoryStore
+from dag_ytdlp.youtube.tables import METADATA
+
+
+@pytest.fixture
+def store(tmp_path) -> HistoryStore:
+    """Return a history store backed by a temporary SQLite database, with every table and no ytdl schema."""
+    store = HistoryStore(f"sqlite:///{tmp_path}/history.db", execution_options={"schema_translate_map": {"ytdl": None}})
+    METADATA.create_all(store.engine)
+    return store
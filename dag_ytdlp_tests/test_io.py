@@ -0,0 +1,27 @@
+from dag_ytdlp.utils.io import delete_with_sidecars
+
+
+def test_delete_with_sidecars(tmp_path):
+    """The video is deleted with its sidecars, subtitles of any language included, and nothing else."""
+    video = tmp_path / "a (S24E0105).mp4"
+    sidecars = [
+        "a (S24E0105).info.json",
+        "a (S24E0105).description",
+        "a (S24E0105).webp",
+        "a (S24E0105).en.vtt",
+        "a (S24E0105).en-US.srt",
+        "a (S24E0105).vtt",
+    ]
+    others = ["b (S24E0106).mp4", "b (S24E0106).en.vtt", "a (S24E0105).mp4.part"]
+    for name in [video.name, *sidecars, *others]:
+        (tmp_path / name).write_bytes(b"x")
+
+    deleted = delete_with_sidecars(video)
+
+    assert sorted(deleted) == sorted(str(tmp_path / name) for name in [video.name, *sidecars])
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(others)
+
+
+def test_delete_with_sidecars_missing_folder(tmp_path):
+    """A video whose folder is gone has nothing to delete."""
+    assert delete_with_sidecars(tmp_path / "gone" / "a.mp4") == []
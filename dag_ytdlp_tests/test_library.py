@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from dag_ytdlp.youtube.library import VideoIndex, library_folders
+
+
+def write_video(root, rel_path: str, info: dict, size: int = 100):
+    """Write a video of size bytes and its .info.json sidecar at rel_path under root, without extension."""
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.with_name(f"{path.name}.mp4").write_bytes(b"\0" * size)
+    path.with_name(f"{path.name}.info.json").write_text(json.dumps(info))
+
+
+@pytest.mark.parametrize(
+    "info_path, expected",
+    [
+        ("shared/Dagster/Season 24/a (S24E0105).info.json", ("shared", "Dagster")),
+        ("MISC/Season 24/a (S24E0105).info.json", (None, "MISC")),
+        ("shared/Demos/Season 1/a (S1E3).info.json", ("shared", "Demos")),
+        ("shared/Dagster/a (S24E0105).info.json", ("shared", "Dagster")),
+        ("a.info.json", (None, None)),
+    ],
+)
+def test_library_folders(info_path, expected):
+    """Parent and channel follow the output template, with or without parent and season folders."""
+    assert library_folders(info_path) == expected
+
+
+def test_refresh_indexes_channels_with_and_without_parent(store, tmp_path):
+    """Downloads without a parent folder are counted under their channel, not their season folder."""
+    root = tmp_path / "library"
+    info = {"id": "abcdefghijk", "title": "A", "upload_date": "20240105", "duration": 61.4, "channel": "Other"}
+    write_video(root, "shared/Dagster/Season 24/a (S24E0105)", info, size=1000)
+    write_video(root, "MISC/Season 24/b (S24E0106)", {**info, "id": "bbbbbbbbbbb"}, size=3000)
+    index = VideoIndex(store)
+
+    report = index.refresh(str(root))
+
+    assert report == {"indexed": 2, "unchanged": 0, "failed": 0, "removed": 0}
+    assert index.usage_by_channel() == {
+        "MISC": {"videos": 1, "bytes": 3000, "seconds": 61},
+        "Dagster": {"videos": 1, "bytes": 1000, "seconds": 61},
+    }
+    assert index.refresh(str(root))["unchanged"] == 2
@@ -0,0 +1,58 @@
+from dag_ytdlp.youtube import planning
+from dag_ytdlp.youtube.planning import estimate_size, plan_downloads
+
+CHANNEL_A = "https://www.youtube.com/@a/videos"
+CHANNEL_B = "https://www.youtube.com/@b/videos"
+
+
+def item(url: str, size: int, subscription_url: str = CHANNEL_A, priority: int = 0, upload_date: str = None) -> dict:
+    """Return a queue item of size estimated bytes."""
+    return {
+        "url": url,
+        "subscription_url": subscription_url,
+        "estimated_size": size,
+        "priority": priority,
+        "upload_date": upload_date,
+        "playlist_index": 1,
+    }
+
+
+def test_estimate_size():
+    """Sizes come from yt-dlp when reported, otherwise from the duration at the bitrate of the format."""
+    assert estimate_size({"filesize": 10, "filesize_approx": 20, "duration": 600}) == 10
+    assert estimate_size({"filesize_approx": 20}) == 20
+    assert estimate_size({"duration": 600}) < estimate_size({"duration": 600}, best_format=True)
+
+
+def test_plan_downloads_global_budget():
+    """Items are taken by priority while they fit, and smaller items still fit after a large one is deferred."""
+    items = [
+        item("old", 40, upload_date="20240101"),
+        item("new", 80, upload_date="20240301"),
+        item("priority", 50, subscription_url=CHANNEL_B, priority=1),
+    ]
+
+    selected, deferred = plan_downloads(items, budget=100, run_budget=None)
+
+    assert [x["url"] for x in selected] == ["priority", "old"]
+    assert [x["url"] for x in deferred] == ["new"]
+
+
+def test_plan_downloads_channel_budget():
+    """A channel's max_bytes defers its items without holding back other channels."""
+    items = [item("a1", 30), item("a2", 30), item("b1", 30, subscription_url=CHANNEL_B)]
+
+    selected, deferred = plan_downloads(items, {CHANNEL_A: 50, CHANNEL_B: None}, budget=100, run_budget=None)
+
+    assert sorted(x["url"] for x in selected) == ["a1", "b1"]
+    assert [x["url"] for x in deferred] == ["a2"]
+
+
+def test_plan_downloads_run_budget(monkeypatch):
+    """Without a global budget, the free disk space is capped by the run budget."""
+    monkeypatch.setattr(planning, "available_bytes", lambda: 1000)
+
+    selected, deferred = plan_downloads([item("a1", 30), item("a2", 30)], run_budget=50)
+
+    assert [x["url"] for x in selected] == ["a1"]
+    assert [x["url"] for x in deferred] == ["a2"]
@@ -0,0 +1,54 @@
+import datetime as dt
+
+import pytest
+
+from dag_ytdlp.youtube.queue import FAILED, PERMANENT, TRANSIENT, DownloadQueue, classify_error, upcoming_delay
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        ("ERROR: [youtube] abcdefghijk: Premieres in 10 hours", dt.timedelta(hours=10)),
+        ("ERROR: [youtube] abcdefghijk: This live event will begin in a day.", dt.timedelta(days=1)),
+        ("ERROR: [youtube] abcdefghijk: Premieres in 2 weeks", dt.timedelta(weeks=2)),
+        ("ERROR: [youtube] abcdefghijk: Video unavailable", None),
+        (None, None),
+    ],
+)
+def test_upcoming_delay(error, expected):
+    """The start of upcoming premieres and live events is read from the yt-dlp error."""
+    assert upcoming_delay(error) == expected
+
+
+def test_premieres_are_transient():
+    """Premieres become downloadable later, unlike removed videos."""
+    assert classify_error("ERROR: [youtube] abcdefghijk: Premieres in 10 hours") == TRANSIENT
+    assert classify_error("ERROR: [youtube] abcdefghijk: Video unavailable") == PERMANENT
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        "ERROR: [youtube] abcdefghijk: Video unavailable. This content isn't available, try again later.",
+        "ERROR: [youtube] abcdefghijk: Sign in to confirm you’re not a bot. This helps protect our community.",
+        "ERROR: unable to download video data: HTTP Error 429: Too Many Requests",
+    ],
+)
+def test_rate_limits_are_transient(error):
+    """Rate limits are retried, even when YouTube words them like an unavailable video."""
+    assert classify_error(error) == TRANSIENT
+
+
+def test_fail_retries_premiere_after_it_starts(store):
+    """A failed premiere is retried shortly after its start rather than after the backoff."""
+    queue = DownloadQueue(store)
+    item = {"url": URL, "subscription_url": "https://www.youtube.com/@x/videos", "channel": "x", "playlist_index": 1}
+    queue.enqueue([item])
+    queue.lease("worker", item["subscription_url"])
+
+    assert queue.fail(URL, "ERROR: [youtube] abcdefghijk: Premieres in 2 days") == FAILED
+    with store.engine.connect() as conn:
+        next_attempt_at = conn.execute(queue.table.select()).mappings().one()["next_attempt_at"]
+    assert dt.timedelta(days=2) < next_attempt_at - dt.datetime.now() <= dt.timedelta(days=2, minutes=15)
@@ -0,0 +1,25 @@
+import datetime as dt
+
+from dag_ytdlp.youtube.retention import delete_expired_downloads
+
+SYNCED_URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+UNSYNCED_URL = "https://www.youtube.com/watch?v=bbbbbbbbbbb"
+SYNCED_PATH = "a/Season 24/synced (S24E0105).mp4"
+UNSYNCED_PATH = "a/Season 24/unsynced (S24E0106).mp4"
+
+
+def test_only_synced_downloads_are_deleted(store, tmp_path):
+    """Expired downloads are deleted from the NAS once synced, unsynced ones are kept for the sync."""
+    nas = tmp_path / "nas"
+    (nas / SYNCED_PATH).parent.mkdir(parents=True)
+    (nas / SYNCED_PATH).write_bytes(b"video")
+    store.record(SYNCED_URL, "a", SYNCED_PATH, 5)
+    store.record(UNSYNCED_URL, "a", UNSYNCED_PATH, 7)
+    store.mark_synced([(SYNCED_URL[-11:], "a")])
+    with store.engine.begin() as conn:
+        conn.execute(store.table.update().values(download_date=dt.datetime.now() - dt.timedelta(days=100)))
+
+    assert delete_expired_downloads(store, "a", str(nas), 90) == 5
+    assert not (nas / SYNCED_PATH).exists()
+    assert [row["url"] for row in store.unsynced_files()] == [UNSYNCED_URL]
+    assert store.expired_files("a", dt.datetime.now()) == []
@@ -0,0 +1,82 @@
+import pytest
+
+from dag_ytdlp.config.subscriptions import SubscriptionRegistry, parse_subscriptions
+from dag_ytdlp.utils.exceptions import SubscriptionConfigError
+
+SUBSCRIPTIONS = b"""
+shared:
+  Dagster:
+    url: https://www.youtube.com/@dagsterio/videos
+    use_playlist_index: true
+    priority: 2
+    link_existing: hardlink
+kids:
+  Cartoons:
+    url: " https://www.youtube.com/@cartoons/videos "
+    ephemeral: true
+"""
+
+
+def test_parse_subscriptions():
+    """Channels are read in file order, with renamed keys, stripped URLs and defaults."""
+    subscriptions = parse_subscriptions(SUBSCRIPTIONS)
+
+    assert [sub.channel for sub in subscriptions] == ["Dagster", "Cartoons"]
+    dagster = subscriptions.get("Dagster")
+    assert dagster.parent == "shared"
+    assert dagster.order_seq and dagster.priority == 2 and dagster.link_existing == "hardlink"
+    cartoons = subscriptions.get("Cartoons")
+    assert cartoons.url == "https://www.youtube.com/@cartoons/videos"
+    assert cartoons.ephemeral and cartoons.incremental
+    assert "Cartoons" in subscriptions and "Other" not in subscriptions
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"shared: [",
+        b"- shared",
+        b"shared: Dagster",
+        b"shared:\n  Dagster: https://www.youtube.com/@dagsterio/videos",
+        b"shared:\n  Dagster:\n    ephemeral: true",
+        b"shared:\n  Dagster:\n    url: x\n    ephemeral: yes please",
+        b"shared:\n  Dagster:\n    url: x\n    max_bytes: true",
+        b"shared:\n  Dagster:\n    url: x\n    link_existing: copy",
+        b"shared:\n  Dagster:\n    url: x\nkids:\n  Dagster:\n    url: y",
+    ],
+)
+def test_parse_subscriptions_invalid(data):
+    """Invalid YAML, structure or options raise SubscriptionConfigError."""
+    with pytest.raises(SubscriptionConfigError):
+        parse_subscriptions(data)
+
+
+def test_diff():
+    """Channels added, removed and changed are found from the digests of a previous version."""
+    previous = parse_subscriptions(SUBSCRIPTIONS).digests()
+    current = parse_subscriptions(
+        b"shared:\n  Dagster:\n    url: https://www.youtube.com/@dagsterio/videos\n    priority: 1\n"
+        b"  News:\n    url: https://www.youtube.com/@news/videos"
+    )
+
+    assert current.diff(previous) == (["News"], ["Cartoons"], ["Dagster"])
+    assert not current.diff(current.digests())
+
+
+def test_registry_reloads_changed_file(tmp_path):
+    """The registry keeps its subscriptions until the content of the file changes."""
+    path = tmp_path / "subscriptions.yaml"
+    path.write_bytes(SUBSCRIPTIONS)
+    registry = SubscriptionRegistry(str(path))
+
+    first = registry.load()
+    path.write_bytes(SUBSCRIPTIONS)
+    assert registry.load() is first
+    path.write_bytes(b"shared:\n  News:\n    url: https://www.youtube.com/@news/videos\n")
+    assert [sub.channel for sub in registry.load()] == ["News"]
+
+
+def test_registry_missing_file(tmp_path):
+    """A missing file raises SubscriptionConfigError."""
+    with pytest.raises(SubscriptionConfigError):
+        SubscriptionRegistry(str(tmp_path / "missing.yaml")).load()
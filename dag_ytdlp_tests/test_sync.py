@@ -0,0 +1,93 @@
+import pytest
+
+from dag_ytdlp.utils.exceptions import SyncVerificationError
+from dag_ytdlp.youtube import sync
+from dag_ytdlp.youtube.sync import copy_verified, sync_downloads
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+FILE_PATH = "shared/Dagster/Season 24/a (S24E0105).mp4"
+
+
+@pytest.fixture
+def roots(tmp_path):
+    """Return a downloads folder holding a video with its sidecars, and an empty NAS folder."""
+    source = tmp_path / "downloads"
+    target = tmp_path / "nas"
+    video = source / FILE_PATH
+    video.parent.mkdir(parents=True)
+    video.write_bytes(b"video" * 1000)
+    video.with_name("a (S24E0105).info.json").write_text("{}")
+    video.with_name("a (S24E0105).mp4.part").write_bytes(b"partial")
+    target.mkdir()
+    return source, target
+
+
+@pytest.fixture
+def recorded(store, roots):
+    """Record the video of roots in history as downloaded and not yet synced."""
+    store.record(URL, "Dagster", FILE_PATH, (roots[0] / FILE_PATH).stat().st_size)
+    return store
+
+
+def test_copy_verified(tmp_path):
+    """A copy is written once, then skipped while the target matches."""
+    src = tmp_path / "src.mp4"
+    src.write_bytes(b"x" * 3000)
+    dest = tmp_path / "nas" / "dest.mp4"
+
+    assert copy_verified(src, dest, chunk_size=1024)
+    assert dest.read_bytes() == src.read_bytes()
+    assert not copy_verified(src, dest, chunk_size=1024)
+    assert list(dest.parent.iterdir()) == [dest]
+
+
+def test_copy_verified_mismatch(tmp_path, monkeypatch):
+    """A copy failing verification raises and leaves neither the target nor a temporary file."""
+    src = tmp_path / "src.mp4"
+    src.write_bytes(b"x" * 3000)
+    dest = tmp_path / "nas" / "dest.mp4"
+    monkeypatch.setattr(sync, "file_digest", lambda path, chunk_size=None: "mismatch")
+
+    with pytest.raises(SyncVerificationError):
+        copy_verified(src, dest)
+    assert list(dest.parent.iterdir()) == []
+
+
+def test_sync_downloads(recorded, roots):
+    """The video and its sidecars are synced and deleted locally, partial files are left alone."""
+    source, target = roots
+
+    report = sync_downloads(recorded, str(source), str(target))
+
+    assert report == {"downloads": 1, "failed": 0, "files": 2, "files_skipped": 0, "bytes": 5002}
+    assert (target / FILE_PATH).read_bytes() == b"video" * 1000
+    assert (target / FILE_PATH).with_name("a (S24E0105).info.json").exists()
+    assert not (target / FILE_PATH).with_name("a (S24E0105).mp4.part").exists()
+    assert [p.name for p in (source / FILE_PATH).parent.iterdir()] == ["a (S24E0105).mp4.part"]
+    assert recorded.unsynced_files() == []
+
+
+def test_sync_downloads_keeps_local_files(recorded, roots):
+    """With delete_local False, the local files are kept but the download is still marked synced."""
+    source, target = roots
+
+    report = sync_downloads(recorded, str(source), str(target), delete_local=False)
+
+    assert report["downloads"] == 1
+    assert (source / FILE_PATH).exists()
+    assert (target / FILE_PATH).exists()
+    assert recorded.unsynced_files() == []
+
+
+def test_sync_downloads_mismatch_keeps_local_files(recorded, roots, monkeypatch):
+    """A download failing verification keeps its local files and stays unsynced for the next run."""
+    source, target = roots
+    monkeypatch.setattr(sync, "file_digest", lambda path, chunk_size=None: "mismatch")
+
+    report = sync_downloads(recorded, str(source), str(target))
+
+    assert report["failed"] == 1
+    assert report["downloads"] == 0
+    assert (source / FILE_PATH).exists()
+    assert not (target / FILE_PATH).exists()
+    assert [row["file_path"] for row in recorded.unsynced_files()] == [FILE_PATH]
@@ -0,0 +1,100 @@
+import datetime as dt
+
+import pytest
+
+from dag_ytdlp.benchmarks.fake import FakeYoutubeDL, bench_channel_url, bench_video_url
+from dag_ytdlp.config.ytdl import INCREMENTAL_STOP_AFTER
+from dag_ytdlp.youtube import dedup
+from dag_ytdlp.youtube.history import get_video_id, history_row
+from dag_ytdlp.youtube.queue import DONE, DownloadQueue
+from dag_ytdlp.youtube.ytdl import YT_Channel
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+CHANNEL_A = "https://www.youtube.com/@a/videos"
+CHANNEL_B = "https://www.youtube.com/@b/videos"
+
+
+class FailingYoutubeDL(FakeYoutubeDL):
+    """FakeYoutubeDL failing every extraction, as YoutubeDL does with ignoreerrors."""
+
+    def extract_info(self, url: str, download: bool = False, process: bool = False):
+        """Count the request and return None."""
+        self._request(self.latency)
+        return None
+
+
+@pytest.fixture
+def channel(store, tmp_path, monkeypatch):
+    """Return a function building a YT_Channel backed by store, downloading under a temporary folder."""
+    monkeypatch.setenv("YT_DOWNLOADS_PATH", str(tmp_path / "downloads"))
+
+    def build(url: str, name: str, **kwargs) -> YT_Channel:
+        return YT_Channel(url, name, history=store, scheduler=object(), **kwargs)
+
+    return build
+
+
+@pytest.fixture
+def downloaded_by_a(store):
+    """Queue and download URL for channel a, leaving it waiting to be synced to the NAS."""
+    queue = DownloadQueue(store)
+    queue.enqueue([{"url": URL, "subscription_url": CHANNEL_A, "channel": "a", "playlist_index": 1}])
+    queue.lease("worker", CHANNEL_A)
+    store.record(URL, "a", "a/Season 24/v (S24E0105).mp4", 10)
+    return queue
+
+
+def test_waiting_videos_are_not_queued(store, channel, downloaded_by_a, tmp_path, monkeypatch):
+    """A video another channel has not synced yet is left to link later, not queued again."""
+    monkeypatch.setattr(dedup, "YT_NAS_PATH", str(tmp_path / "nas"))
+    channel_b = channel(CHANNEL_B, "b", link_existing=dedup.HARDLINK)
+    channel_b.video_urls = [(URL, 1)]
+
+    handled = channel_b.enqueue_new_videos()
+
+    assert handled == set()
+    assert downloaded_by_a.ready() == []
+    with store.engine.connect() as conn:
+        row = conn.execute(downloaded_by_a.table.select()).mappings().one()
+    assert (row["status"], row["subscription_url"]) == (DONE, CHANNEL_A)
+
+
+@pytest.mark.parametrize("ydl_class, cached", [(FakeYoutubeDL, True), (FailingYoutubeDL, False)])
+def test_listing_cached_after_successful_extraction(store, channel, monkeypatch, ydl_class, cached):
+    """A listing is cached once extracted, a failed extraction leaves the channel due for listing."""
+    monkeypatch.setattr(YT_Channel, "ydl_class", ydl_class)
+    ydl_class.reset(videos=3)
+    url = bench_channel_url(0)
+    last_new_video_at = dt.datetime.now().astimezone() - dt.timedelta(hours=1)
+    store.set_channel_state(url, channel="bench0", posting_interval=24 * 3600, last_new_video_at=last_new_video_at)
+    ytdl = channel(url, "bench0", cache_listing=True)
+
+    ytdl.fetch_entries()
+    ytdl.enqueue_new_videos()
+    ytdl = channel(url, "bench0", cache_listing=True)
+    ytdl.fetch_entries()
+
+    assert ytdl.listing_cached == cached
+    assert ydl_class.requests == (1 if cached else 2)
+
+
+def test_incremental_listing_stops_at_downloaded_videos(store, channel, monkeypatch):
+    """Paging stops after consecutive downloaded videos, then at the high-water mark once it is set."""
+    monkeypatch.setattr(YT_Channel, "ydl_class", FakeYoutubeDL)
+    FakeYoutubeDL.reset(videos=100)
+    url = bench_channel_url(0)
+    store.record_many([history_row(bench_video_url(0, i), "bench0") for i in range(2, 100)])
+    ytdl = channel(url, "bench0", incremental=True)
+
+    ytdl.fetch_entries()
+
+    listed = [video_url for (video_url, _) in ytdl.video_urls]
+    assert listed == [bench_video_url(0, i) for i in range(2 + INCREMENTAL_STOP_AFTER)]
+    assert FakeYoutubeDL.requests == 1
+
+    ytdl.update_high_water_mark(ytdl.enqueue_new_videos())
+    assert store.get_channel_state(url)["last_video_id"] == get_video_id(bench_video_url(0, 2))
+
+    ytdl = channel(url, "bench0", incremental=True)
+    ytdl.fetch_entries()
+    assert [video_url for (video_url, _) in ytdl.video_urls] == [bench_video_url(0, 0), bench_video_url(0, 1)]
@@ -1,5 +1,76 @@
 create table downloads (
+    video_id varchar(150),
+    channel varchar(40),
+    url varchar(150),
+    download_date timestamptz,
+    file_path text,
+    file_size bigint,
+    synced_at timestamptz,
+    deleted_at timestamptz,
+    primary key (video_id, channel)
+);
+
+create index ix_downloads_channel_download_date on downloads (channel, download_date);
+create index ix_downloads_unsynced on downloads (download_date) where synced_at is null and file_path is not null;
+
+create table channels (
+    url varchar(200) primary key,
+    channel varchar(40),
+    reverse_entries boolean,
+    last_video_id varchar(150),
+    listing json,
+    listed_at timestamptz,
+    next_listing_at timestamptz,
+    last_new_video_at timestamptz,
+    posting_interval double precision,
+    feed_url varchar(200),
+    feed_etag varchar(200),
+    feed_last_modified varchar(50),
+    next_feed_check_at timestamptz,
+    updated_at timestamptz
+);
+
+create table download_queue (
     url varchar(150) primary key,
+    subscription_url varchar(200),
+    channel varchar(40),
+    parent varchar(40),
+    order_seq boolean,
+    best_format boolean,
+    playlist_index integer,
+    upload_date varchar(8),
+    estimated_size bigint,
+    priority integer,
+    status varchar(12),
+    attempts integer,
+    last_error text,
+    failure_kind varchar(12),
+    next_attempt_at timestamptz,
+    leased_by varchar(100),
+    leased_at timestamptz,
+    enqueued_at timestamptz,
+    updated_at timestamptz
+);
+
+create index ix_download_queue_status on download_queue (status);
+create index ix_download_queue_subscription_url on download_queue (subscription_url);
+create table videos (
+    info_path text primary key,
+    video_id varchar(64),
+    url varchar(150),
+    parent varchar(40),
     channel varchar(40),
-    download_date timestamptz
-);
\ No newline at end of file
+    title text,
+    upload_date date,
+    duration integer,
+    file_path text,
+    file_size bigint,
+    source_mtime double precision,
+    indexed_at timestamptz
+);
+
+create index ix_videos_video_id on videos (video_id);
+create index ix_videos_channel on videos (channel);
+create index ix_videos_upload_date on videos (upload_date);
+create index ix_videos_duration on videos (duration);
+create index ix_videos_file_size on videos (file_size);
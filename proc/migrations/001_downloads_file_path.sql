@@ -0,0 +1,6 @@
+-- Track downloaded files in history, for database driven retention
+alter table downloads add column file_path text;
+alter table downloads add column file_size bigint;
+alter table downloads add column deleted_at timestamptz;
+
+create index ix_downloads_channel_download_date on downloads (channel, download_date);
@@ -0,0 +1,15 @@
+-- Per channel/playlist state learned from previous runs, applied before 002_channels_feeds.sql. Columns are added
+-- one by one, so databases created with an earlier proc/dag_ytdlp.sql are completed as well.
+create table if not exists channels (
+    url varchar(200) primary key
+);
+
+alter table channels add column if not exists channel varchar(40);
+alter table channels add column if not exists reverse_entries boolean;
+alter table channels add column if not exists last_video_id varchar(150);
+alter table channels add column if not exists listing json;
+alter table channels add column if not exists listed_at timestamptz;
+alter table channels add column if not exists next_listing_at timestamptz;
+alter table channels add column if not exists last_new_video_at timestamptz;
+alter table channels add column if not exists posting_interval double precision;
+alter table channels add column if not exists updated_at timestamptz;
@@ -0,0 +1,27 @@
+-- Download work persisted between runs, resumed by the next refresh of each channel. Columns are added one by one,
+-- so databases created with an earlier proc/dag_ytdlp.sql are completed as well.
+create table if not exists download_queue (
+    url varchar(150) primary key
+);
+
+alter table download_queue add column if not exists subscription_url varchar(200);
+alter table download_queue add column if not exists channel varchar(40);
+alter table download_queue add column if not exists parent varchar(40);
+alter table download_queue add column if not exists order_seq boolean;
+alter table download_queue add column if not exists best_format boolean;
+alter table download_queue add column if not exists playlist_index integer;
+alter table download_queue add column if not exists upload_date varchar(8);
+alter table download_queue add column if not exists estimated_size bigint;
+alter table download_queue add column if not exists priority integer;
+alter table download_queue add column if not exists status varchar(12);
+alter table download_queue add column if not exists attempts integer;
+alter table download_queue add column if not exists last_error text;
+alter table download_queue add column if not exists failure_kind varchar(12);
+alter table download_queue add column if not exists next_attempt_at timestamptz;
+alter table download_queue add column if not exists leased_by varchar(100);
+alter table download_queue add column if not exists leased_at timestamptz;
+alter table download_queue add column if not exists enqueued_at timestamptz;
+alter table download_queue add column if not exists updated_at timestamptz;
+
+create index if not exists ix_download_queue_status on download_queue (status);
+create index if not exists ix_download_queue_subscription_url on download_queue (subscription_url);
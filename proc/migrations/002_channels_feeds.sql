@@ -0,0 +1,5 @@
+-- Track channel RSS feeds, polled by refresh_yt_channels_sensor
+alter table channels add column if not exists feed_url varchar(200);
+alter table channels add column if not exists feed_etag varchar(200);
+alter table channels add column if not exists feed_last_modified varchar(50);
+alter table channels add column if not exists next_feed_check_at timestamptz;
@@ -0,0 +1,4 @@
+-- Track downloads transferred to the NAS, for sync_yt_downloads_to_nas
+alter table downloads add column synced_at timestamptz;
+
+create index ix_downloads_unsynced on downloads (download_date) where synced_at is null and file_path is not null;
@@ -0,0 +1,21 @@
+-- Index of video metadata read from .info.json sidecars, for index_yt_video_metadata
+create table videos (
+    info_path text primary key,
+    video_id varchar(64),
+    url varchar(150),
+    parent varchar(40),
+    channel varchar(40),
+    title text,
+    upload_date date,
+    duration integer,
+    file_path text,
+    file_size bigint,
+    source_mtime double precision,
+    indexed_at timestamptz
+);
+
+create index ix_videos_video_id on videos (video_id);
+create index ix_videos_channel on videos (channel);
+create index ix_videos_upload_date on videos (upload_date);
+create index ix_videos_duration on videos (duration);
+create index ix_videos_file_size on videos (file_size);
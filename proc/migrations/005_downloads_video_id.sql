@@ -0,0 +1,16 @@
+-- Key history by video ID and channel instead of the raw URL, so a video reached through different URL forms is
+-- downloaded once. Rows of the same video downloaded twice by one channel are reduced to the oldest, rows without a
+-- download date last. Non-YouTube URLs are their own video ID, hence the width of url.
+alter table downloads add column video_id varchar(150);
+update downloads set video_id = coalesce(substring(url from '(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})'), trim(url));
+update downloads set channel = '' where channel is null;
+delete from downloads d using downloads o
+where d.video_id = o.video_id and d.channel = o.channel
+    and (coalesce(o.download_date, 'infinity'), o.url) < (coalesce(d.download_date, 'infinity'), d.url);
+
+-- the same video downloaded by several channels gets the same URL, so url is no longer unique
+alter table downloads drop constraint downloads_pkey;
+update downloads set url = 'https://www.youtube.com/watch?v=' || video_id where video_id <> trim(url);
+
+alter table downloads alter column video_id set not null;
+alter table downloads add primary key (video_id, channel);
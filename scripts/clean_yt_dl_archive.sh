@@ -1,4 +1,6 @@
 #!/bin/bash
 
-# Delete videos older than 3 days
-find $YT_DOWNLOADS_PATH -mindepth 1 -mtime +3 -delete
+# Videos are moved to the NAS by the sync_yt_downloads_to_nas job once verified, only delete partial downloads
+# abandoned for over 2 weeks and the empty folders left behind
+find $YT_DOWNLOADS_PATH -mindepth 1 -type f \( -name '*.part' -o -name '*.ytdl' \) -mtime +14 -delete
+find $YT_DOWNLOADS_PATH -mindepth 1 -type d -empty -delete
@@ -2,7 +2,7 @@ from setuptools import find_packages, setup
 
 setup(
     name="dag_ytdlp",
-    packages=find_packages(),
+    packages=find_packages(exclude=["dag_ytdlp_tests"]),
     install_requires=[
         "dagster~=1.7.12",
         "dagster-docker~=0.23.12",
@@ -14,6 +14,6 @@ setup(
         "yt-dlp~=2024.5.27",
     ],
     extras_require={
-        "dev": ["ruff~=0.4.8", "ipykernel~=6.29.3"],
+        "dev": ["ruff~=0.4.8", "ipykernel~=6.29.3", "pytest"],
     },
 )